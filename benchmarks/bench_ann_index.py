@@ -0,0 +1,77 @@
+"""
+Recall@k and QPS of VectorDB with an IVFIndex against exact search, on a
+clustered synthetic corpus, plus save/load (memory-mapped) timing.
+
+    python benchmarks/bench_ann_index.py [N_DOCS]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE", "postgresql://localhost/synapse")  # tooling imports search; nothing connects
+
+import numpy as np
+
+from routers.llm.ann_index import IVFIndex
+from routers.llm.tooling import VectorDB
+
+DIM = 128
+TOP_K = 10
+QUERIES = 500
+NPROBES = [1, 4, 8, 16, 32]
+
+
+def corpus(n: int, rng):
+    centers = rng.normal(size=(1024, DIM)).astype(np.float32)
+    labels = rng.integers(0, len(centers), n)
+    return centers[labels] + 0.6 * rng.normal(size=(n, DIM)).astype(np.float32)
+
+
+def run(db: VectorDB, queries):
+    start = time.perf_counter()
+    results = [[doc_id for doc_id, _ in hits] for hits in db.search(queries, TOP_K)]
+    return results, len(queries) / (time.perf_counter() - start)
+
+
+def recall(approx, exact):
+    return np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = np.random.default_rng(0)
+    vectors = corpus(n, rng)
+    queries = corpus(QUERIES, rng)
+    texts = [""] * n
+
+    exact_db = VectorDB(embedding_model=None)
+    exact_db.add(vectors, texts)
+    exact, exact_qps = run(exact_db, queries)
+
+    start = time.perf_counter()
+    ivf_db = VectorDB(embedding_model=None, index=IVFIndex(nlist=1024, train_size=50_000))
+    for i in range(0, n, 10_000):  # incremental inserts
+        ivf_db.add(vectors[i:i + 10_000], texts[i:i + 10_000])
+    build = time.perf_counter() - start
+
+    print(f"{n} docs, dim {DIM}, recall@{TOP_K}; IVF build {build:.1f}s")
+    print(f"{'search':>12} {'recall':>8} {'QPS':>10}")
+    print(f"{'exact':>12} {1.0:>8.3f} {exact_qps:>10.0f}")
+    for nprobe in NPROBES:
+        ivf_db.index.nprobe = nprobe
+        approx, qps = run(ivf_db, queries)
+        print(f"{'nprobe=' + str(nprobe):>12} {recall(approx, exact):>8.3f} {qps:>10.0f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        ivf_db.save(directory)
+        start = time.perf_counter()
+        loaded = VectorDB.load(directory, embedding_model=None)
+        load_ms = (time.perf_counter() - start) * 1000
+        approx, _ = run(loaded, queries)
+        print(f"mmap load {load_ms:.0f} ms, recall after load {recall(approx, exact):.3f}")
+
+
+if __name__ == "__main__":
+    main()
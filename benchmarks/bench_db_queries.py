@@ -0,0 +1,71 @@
+"""
+Named-query latency on the chat path against a real Postgres (migrations are
+applied first). Creates a throwaway user and conversation, replays
+owner lookup -> history fetch -> segment append, prints the per-query
+histograms from database.db and cleans up.
+
+    DATABASE=postgresql://localhost/synapse DB_PGBOUNCER=0 python benchmarks/bench_db_queries.py
+    DATABASE=postgresql://localhost/synapse DB_PGBOUNCER=1 python benchmarks/bench_db_queries.py
+
+Compare the two runs to see what statement preparation buys on this deployment.
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DB_PGBOUNCER, database, db
+from helpers import append_segment, get_conversation_messages
+from migrate import run_migrations
+from schemas import StoredMessage
+
+ROUNDS = int(os.getenv("BENCH_ROUNDS", 200))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", 8))
+
+
+def message(role: str, content: str) -> StoredMessage:
+    return StoredMessage(id=str(uuid.uuid4()), role=role, message={"content": content}, created_at=datetime.utcnow())
+
+
+async def chat_turn(conversation_id: str, user_id: str, i: int):
+    await db.fetch_one("conversations.owner", {"conversation_id": conversation_id})
+    await get_conversation_messages(conversation_id, user_id)
+    await append_segment(conversation_id, user_id, [message("user", f"question {i}"), message("assistant", f"answer {i}")])
+
+
+async def main():
+    await database.connect()
+    await run_migrations()
+    user_id, conversation_id = str(uuid.uuid4()), str(uuid.uuid4())
+    await db.execute("users.insert", {"id": user_id, "username": f"bench-{user_id}", "password": "x"})
+    now = datetime.utcnow()
+    await db.execute("conversations.insert", {
+        "id": conversation_id, "user_id": user_id, "llm_model": "bench", "created_at": now, "updated_at": now,
+    })
+    await append_segment(conversation_id, user_id, [message("system", "seed")])
+
+    try:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def bounded(i):
+            async with semaphore:
+                await chat_turn(conversation_id, user_id, i)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(ROUNDS)))
+        elapsed = time.perf_counter() - start
+        print(f"pgbouncer mode={DB_PGBOUNCER}: {ROUNDS} turns in {elapsed:.2f}s ({ROUNDS / elapsed:.0f} turns/s)")
+        for name, stats in db.snapshot()["queries"].items():
+            print(f"  {name:32} calls {stats['calls']:5}  mean {stats['mean_ms']:6.2f} ms  p99 <= {stats['p99_ms']} ms")
+    finally:
+        await database.execute("DELETE FROM conversations WHERE id = :id", {"id": conversation_id})
+        await database.execute("DELETE FROM users WHERE id = :id", {"id": user_id})
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
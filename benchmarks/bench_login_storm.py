@@ -0,0 +1,75 @@
+"""
+Chat-stream jitter during a login storm. A simulated stream emits a token every
+TICK seconds while LOGINS concurrent bcrypt verifications run, first inline on
+the event loop (the old handlers) and then through PasswordHasher.
+
+    python benchmarks/bench_login_storm.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE", "postgresql://localhost/synapse")  # auth imports database; nothing connects
+
+from fastapi import HTTPException
+
+from routers.auth.auth import PasswordHasher, hash_password, verify_password
+
+TICK = 0.01
+LOGINS = 40
+
+
+async def stream_ticks(stop: asyncio.Event, lateness: list):
+    loop = asyncio.get_running_loop()
+    expected = loop.time() + TICK
+    while not stop.is_set():
+        await asyncio.sleep(max(0, expected - loop.time()))
+        lateness.append(max(0.0, loop.time() - expected) * 1000)
+        expected += TICK
+
+
+async def storm(verify, hashed: str):
+    async def one():
+        try:
+            await verify("correct horse battery staple", hashed)
+            return True
+        except HTTPException:
+            return False
+    return await asyncio.gather(*(one() for _ in range(LOGINS)))
+
+
+async def measure(name: str, verify, hashed: str):
+    stop, lateness = asyncio.Event(), []
+    ticker = asyncio.create_task(stream_ticks(stop, lateness))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    results = await storm(verify, hashed)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    lateness.sort()
+    p99 = lateness[int(len(lateness) * 0.99) - 1] if lateness else 0.0
+    print(
+        f"{name:>22}: storm {elapsed:5.2f}s, served {sum(results)}/{LOGINS}, "
+        f"tick lateness p50 {statistics.median(lateness):7.1f} ms, p99 {p99:7.1f} ms, max {lateness[-1]:7.1f} ms"
+    )
+
+
+async def main():
+    hashed = hash_password("correct horse battery staple")
+
+    async def inline(plain, hashed_pw):
+        return verify_password(plain, hashed_pw)
+
+    await measure("inline (event loop)", inline, hashed)
+    for workers, queue_limit in [(2, 64), (4, 64), (2, 8)]:
+        hasher = PasswordHasher(workers=workers, queue_limit=queue_limit)
+        await measure(f"executor {workers}w/q{queue_limit}", hasher.verify, hashed)
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Recent-history read latency vs conversation length: full decode + slice (old path)
+against iter_newest_first, which ConversationManager.load_within_budget walks and
+which decodes only the blocks it reaches.
+
+    python benchmarks/bench_memory_snapshot.py
+"""
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE", "postgresql://localhost/synapse")  # helpers imports database; nothing connects
+
+from helpers import compress_messages, decompress_messages, iter_newest_first
+from schemas import StoredMessage
+
+RECENT_N = 20
+SIZES = [100, 1_000, 5_000, 20_000]
+REPEAT = 20
+
+
+def make_conversation(size: int):
+    now = datetime.utcnow()
+    return [
+        StoredMessage(
+            id=str(uuid.uuid4()),
+            message={"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " * 40},
+            role="user" if i % 2 == 0 else "assistant",
+            created_at=now,
+        )
+        for i in range(size)
+    ]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn(*args)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    print(f"{'messages':>10} {'full (ms)':>12} {'newest (ms)':>12}")
+    for size in SIZES:
+        blob = compress_messages(make_conversation(size))
+        row = {"compressed_messages": blob, "segments": []}
+        full = timed(lambda b: decompress_messages(b)[-RECENT_N:], blob)
+        newest = timed(lambda r: list(islice(iter_newest_first(r), RECENT_N)), row)
+        print(f"{size:>10} {full:>12.2f} {newest:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Paragraph extraction: the previous BeautifulSoup path (full parse, get_text
+twice per <p>) against the streaming ParagraphExtractor fed in network-sized
+chunks with early termination.
+
+    python benchmarks/bench_paragraph_extraction.py [DIR_OF_SAVED_HTML_PAGES]
+
+Without a directory, a synthetic corpus of article-like pages is used.
+"""
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from search import ParagraphExtractor
+
+MAX_PARAGRAPHS = 7
+CHUNK_SIZE = 16 * 1024
+REPEAT = 5
+
+
+def bs4_paragraphs(html: str):
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = [p.get_text(strip=True) for p in soup.find_all("p") if p.get_text(strip=True)]
+    return paragraphs[:MAX_PARAGRAPHS]
+
+
+def streaming_paragraphs(data: bytes):
+    extractor = ParagraphExtractor(MAX_PARAGRAPHS)
+    for i in range(0, len(data), CHUNK_SIZE):
+        extractor.feed(data[i:i + CHUNK_SIZE].decode("utf-8", errors="replace"))
+        if extractor.done:
+            break
+    extractor.close()
+    return extractor.paragraphs
+
+
+def synthetic_corpus():
+    nav = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(200))
+    script = "<script>" + "var x = '<p>not a paragraph</p>';" * 500 + "</script>"
+    body = "".join(
+        "<p>" + f"Paragraph {i} with <b>some</b> <a href='#'>inline</a> markup and filler text. " * 3 + "</p>"
+        for i in range(400)
+    )
+    page = f"<html><head>{script}<style>p {{ color: red }}</style></head><body><ul>{nav}</ul>{body}</body></html>"
+    return [page.encode("utf-8")] * 20
+
+
+def load_corpus(directory: str):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def timed(fn, pages):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for page in pages:
+            fn(page)
+    return (time.perf_counter() - start) / (REPEAT * len(pages)) * 1000
+
+
+def main():
+    pages = load_corpus(sys.argv[1]) if len(sys.argv) > 1 else synthetic_corpus()
+    if not pages:
+        sys.exit("no .html pages found")
+
+    total_kb = sum(len(p) for p in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb / len(pages):.0f} KB average")
+    bs4_ms = timed(lambda p: bs4_paragraphs(p.decode("utf-8", errors="replace")), pages)
+    stream_ms = timed(streaming_paragraphs, pages)
+    print(f"beautifulsoup : {bs4_ms:8.2f} ms/page")
+    print(f"streaming     : {stream_ms:8.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Concurrency load test for LLM.stream_response against a local fake
+OpenAI-compatible server that streams TOKENS deltas, TOKEN_DELAY apart.
+
+With a non-blocking client, wall time stays close to one stream's duration
+as concurrency grows; a blocking client scales linearly with it.
+
+    python benchmarks/load_test_llm_stream.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE", "postgresql://localhost/synapse")  # imported by llm.py; nothing connects
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from routers.llm.llm import LLM, client_pool
+
+HOST, PORT = "127.0.0.1", 8765
+TOKENS = 20
+TOKEN_DELAY = 0.02
+CONCURRENCY = [1, 10, 50, 100, 300]
+
+fake = FastAPI()
+
+
+@fake.post("/v1/chat/completions")
+async def completions():
+    async def stream():
+        for i in range(TOKENS):
+            await asyncio.sleep(TOKEN_DELAY)
+            chunk = {
+                "id": "fake",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "fake",
+                "choices": [{"index": 0, "delta": {"content": f"t{i} "}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+async def one_stream():
+    llm = LLM(model_id="fake", hf_token="test", base_url=f"http://{HOST}:{PORT}/v1")
+    tokens = 0
+    async for _ in llm.stream_response([{"role": "user", "content": "hi"}]):
+        tokens += 1
+    return tokens
+
+
+async def main():
+    server = uvicorn.Server(uvicorn.Config(fake, host=HOST, port=PORT, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    ideal = TOKENS * TOKEN_DELAY
+    print(f"single stream ideal: {ideal * 1000:.0f} ms")
+    print(f"{'streams':>8} {'wall (ms)':>10} {'tokens/s':>10}")
+    try:
+        for n in CONCURRENCY:
+            start = time.perf_counter()
+            counts = await asyncio.gather(*(one_stream() for _ in range(n)))
+            wall = time.perf_counter() - start
+            print(f"{n:>8} {wall * 1000:>10.0f} {sum(counts) / wall:>10.0f}")
+    finally:
+        await client_pool.close()
+        server.should_exit = True
+        await serve
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
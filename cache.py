@@ -0,0 +1,106 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """In-memory LRU with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, name: str, max_entries: int = 1024, ttl: float = 300):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class DiskCache:
+    """
+    SQLite-backed key/value store with expiry, for caches that should survive restarts.
+    Values must be JSON-serializable. Calls block, so run them off the event loop.
+    """
+
+    def __init__(self, path: str, name: str = "disk"):
+        self.name = name
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Returns (value, seconds_left), or None when missing or expired."""
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.conn.commit()
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(value), remaining
+
+    def set(self, key: str, value, ttl: float):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+            self.conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -1,9 +1,137 @@
 import databases
 import os
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
 from dotenv import load_dotenv
+from sqlalchemy import text
+from queries import QUERIES
 
 load_dotenv()
 
 
 DATABASE_URL = os.getenv("DATABASE")
-database = databases.Database(DATABASE_URL, statement_cache_size=0)
+
+# Pool sizing and statement caching. Behind PgBouncer in transaction mode a server
+# connection can change between statements, so prepared statements must stay off
+# (DB_PGBOUNCER=1, the default). Direct connections can set DB_PGBOUNCER=0 and
+# let asyncpg prepare each named query once per connection.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 2))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "1") == "1"
+DB_STATEMENT_CACHE_SIZE = 0 if DB_PGBOUNCER else int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+
+database = databases.Database(
+    DATABASE_URL,
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+)
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class QueryStats:
+    """Latency histogram for one named query: call counts per bucket upper bound, in ms."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.calls = 0
+        self.errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float, slow: bool):
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.calls += 1
+        self.slow += slow
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile; None past the last bound."""
+        if not self.calls:
+            return 0.0
+        target, seen = q * self.calls, 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "slow": self.slow,
+            "mean_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+class QueryRunner:
+    """
+    Runs registered queries by name. SQL is parsed once at startup and its text never
+    changes between calls, which is what lets the driver's statement cache hit. Every
+    call is timed into a per-name histogram and anything over `slow_ms` is logged.
+    """
+
+    def __init__(self, db: databases.Database, queries: Dict[str, str], slow_ms: float = 200):
+        self.db = db
+        self.queries = queries
+        self.slow_ms = slow_ms
+        self.prepared = {name: text(sql) for name, sql in queries.items()}
+        self.stats: Dict[str, QueryStats] = {name: QueryStats() for name in queries}
+
+    async def _run(self, method: str, name: str, values: Optional[dict]):
+        clause = self.prepared[name]
+        if values:
+            clause = clause.bindparams(**values)
+        stats = self.stats[name]
+        start = time.perf_counter()
+        try:
+            return await getattr(self.db, method)(clause)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            slow = elapsed_ms >= self.slow_ms
+            stats.observe(elapsed_ms, slow)
+            if slow:
+                print(f"[db] slow query {name}: {elapsed_ms:.1f} ms")
+
+    async def fetch_one(self, name: str, values: Optional[dict] = None):
+        return await self._run("fetch_one", name, values)
+
+    async def fetch_all(self, name: str, values: Optional[dict] = None):
+        return await self._run("fetch_all", name, values)
+
+    async def execute(self, name: str, values: Optional[dict] = None):
+        return await self._run("execute", name, values)
+
+    def transaction(self):
+        return self.db.transaction()
+
+    def snapshot(self) -> dict:
+        return {
+            "pool": {
+                "min_size": DB_POOL_MIN,
+                "max_size": DB_POOL_MAX,
+                "pgbouncer": DB_PGBOUNCER,
+                "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            },
+            "slow_query_ms": self.slow_ms,
+            "queries": {name: stats.snapshot() for name, stats in self.stats.items() if stats.calls},
+        }
+
+
+db = QueryRunner(database, QUERIES, slow_ms=DB_SLOW_QUERY_MS)
@@ -1,24 +1,97 @@
 from schemas import StoredMessage
 from typing import List, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
 import zlib
 import json
+import struct
 import uuid
-from database import database
+from database import db
 from fastapi import HTTPException
 import asyncio
+import base64
+import os
+import time
+from collections import OrderedDict
 
-def compress_messages(messages: List["StoredMessage"]) -> bytes:
+# Append-only mode writes each save as a small compressed segment instead of
+# rewriting the whole history; segments are folded back into the blob in the background.
+APPEND_ONLY = os.getenv("CONVERSATION_APPEND_ONLY", "1") == "1"
+COMPACT_THRESHOLD = int(os.getenv("CONVERSATION_COMPACT_THRESHOLD", 32))
+
+# Shared manager cache. Write-behind coalesces appends landing within the delay into one write.
+CACHE_MAX_ENTRIES = int(os.getenv("CONVERSATION_CACHE_MAX_ENTRIES", 1024))
+CACHE_MAX_BYTES = int(os.getenv("CONVERSATION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_TTL = float(os.getenv("CONVERSATION_CACHE_TTL", 300))
+WRITE_BEHIND = os.getenv("CONVERSATION_WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_DELAY = float(os.getenv("CONVERSATION_WRITE_BEHIND_DELAY", 2.0))
+RECENT_KEEP = 256
+
+# Conversation listing page sizes
+LIST_PAGE_SIZE = int(os.getenv("CONVERSATION_LIST_PAGE_SIZE", 50))
+LIST_PAGE_MAX = 200
+
+SYSTEM_PROMPT = "You are an assistant aware of the recent conversation context with the user."
+MESSAGE_TOKEN_OVERHEAD = 4  # role and framing tokens per chat message
+
+def estimate_tokens(content) -> int:
+    """
+    Cheap token estimate, roughly 4 characters per token plus per-message overhead.
+    Model tokenizers aren't available server-side, so this errs slightly high.
+    """
+    if not isinstance(content, str):
+        content = json.dumps(content) if content else ""
+    return (len(content) + 3) // 4 + MESSAGE_TOKEN_OVERHEAD
+
+def message_tokens(message: "StoredMessage") -> int:
+    return message.token_count or estimate_tokens(message.message.get("content", ""))
+
+def walk_within_budget(newest_first, budget: int, stop_at_id: str = None, overflow_limit: int = 0):
+    """
+    Walks messages newest first, keeping those that fit in `budget` tokens and stopping
+    at `stop_at_id`, the last message already folded into the rolling summary. Older
+    messages that no longer fit are counted as overflow, up to `overflow_limit`.
+    Returns (window oldest first, overflow, exhausted), where `exhausted` means the
+    walk ran out of messages rather than stopping at the marker or the limit.
+    """
+    window: List["StoredMessage"] = []
+    used = overflow = 0
+    for message in newest_first:
+        if stop_at_id is not None and message.id == stop_at_id:
+            window.reverse()
+            return window, overflow, False
+        cost = message_tokens(message)
+        if not overflow and used + cost <= budget:
+            window.append(message)
+            used += cost
+            continue
+        overflow += 1
+        if overflow >= max(overflow_limit, 1):
+            window.reverse()
+            return window, overflow, False
+    window.reverse()
+    return window, overflow, True
+
+def take_within_budget(messages: List["StoredMessage"], budget: int) -> List["StoredMessage"]:
+    """Newest messages whose combined token counts fit in `budget`."""
+    return walk_within_budget(reversed(messages), budget)[0]
+
+# Conversations are stored block-framed so the newest messages can be decoded without
+# touching the rest of the history:
+#   MAGIC | zlib(block 0) | zlib(block 1) | ... | footer json | footer length (4 bytes) | MAGIC
+# The footer lists [offset, length, message_count] for each block, oldest first.
+# Blobs written before this format are a single zlib stream and are still readable.
+FRAME_MAGIC = b"SYNB1"
+BLOCK_SIZE = 32
+_FOOTER_LEN = struct.Struct(">I")
+
+def _encode_block(messages: List["StoredMessage"]) -> bytes:
     return zlib.compress(json.dumps(
         [m.dict() for m in messages],
         default=lambda o: o.isoformat() if isinstance(o, datetime) else o
     ).encode("utf-8"))
 
-def decompress_messages(data: bytes) -> List["StoredMessage"]:
-    if not data:
-        return []
-    raw = zlib.decompress(data)
-    items = json.loads(raw)
+def _decode_block(data: bytes) -> List["StoredMessage"]:
+    items = json.loads(zlib.decompress(data))
     # convert created_at back into datetime objects
     for m in items:
         if "created_at" in m and isinstance(m["created_at"], str):
@@ -28,44 +101,269 @@ def decompress_messages(data: bytes) -> List["StoredMessage"]:
                 pass
     return [StoredMessage(**m) for m in items]
 
+def _frame(blocks: List[bytes], index: List[List[int]]) -> bytes:
+    footer = json.dumps(index).encode("utf-8")
+    return b"".join([FRAME_MAGIC, *blocks, footer, _FOOTER_LEN.pack(len(footer)), FRAME_MAGIC])
+
+def _read_index(data: bytes):
+    """Returns the block index of a framed blob, or None for the legacy single-stream format."""
+    if not data.startswith(FRAME_MAGIC) or not data.endswith(FRAME_MAGIC):
+        return None
+    end = len(data) - len(FRAME_MAGIC)
+    (footer_len,) = _FOOTER_LEN.unpack(data[end - _FOOTER_LEN.size:end])
+    footer_start = end - _FOOTER_LEN.size - footer_len
+    return json.loads(data[footer_start:end - _FOOTER_LEN.size])
+
+def compress_messages(messages: List["StoredMessage"]) -> bytes:
+    blocks, index = [], []
+    offset = len(FRAME_MAGIC)
+    for i in range(0, len(messages), BLOCK_SIZE):
+        chunk = messages[i:i + BLOCK_SIZE]
+        block = _encode_block(chunk)
+        blocks.append(block)
+        index.append([offset, len(block), len(chunk)])
+        offset += len(block)
+    return _frame(blocks, index)
+
+def decompress_messages(data: bytes) -> List["StoredMessage"]:
+    if not data:
+        return []
+    index = _read_index(data)
+    if index is None:
+        return _decode_block(data)
+    messages = []
+    for offset, length, _ in index:
+        messages.extend(_decode_block(data[offset:offset + length]))
+    return messages
+
+def iter_blocks_reversed(data: bytes):
+    """Yields the messages of `data` block by block, newest block first."""
+    if not data:
+        return
+    index = _read_index(data)
+    if index is None:
+        yield _decode_block(data)
+        return
+    for offset, length, _ in reversed(index):
+        yield _decode_block(data[offset:offset + length])
+
+def extend_compressed(existing: bytes, messages: List["StoredMessage"]) -> bytes:
+    """
+    Appends messages to a framed blob without recompressing its full blocks.
+    Only a trailing partial block is decoded and re-packed with the new messages.
+    """
+    index = _read_index(existing) if existing else None
+    if index is None:
+        return compress_messages(decompress_messages(existing) + list(messages))
+
+    carry: List[StoredMessage] = []
+    if index and index[-1][2] < BLOCK_SIZE:
+        offset, length, _ = index.pop()
+        carry = _decode_block(existing[offset:offset + length])
+
+    blocks_start = len(FRAME_MAGIC)
+    blocks_end = index[-1][0] + index[-1][1] if index else blocks_start
+    blocks = [existing[blocks_start:blocks_end]]
+    offset = blocks_end
+    pending = carry + list(messages)
+    for i in range(0, len(pending), BLOCK_SIZE):
+        chunk = pending[i:i + BLOCK_SIZE]
+        block = _encode_block(chunk)
+        blocks.append(block)
+        index.append([offset, len(block), len(chunk)])
+        offset += len(block)
+    return _frame(blocks, index)
+
 def append_messages(existing_compressed: bytes, new_messages: List[Dict[str, Any]]) -> bytes:
-    messages = decompress_messages(existing_compressed)
     now = datetime.utcnow()
-    messages.extend([
+    return extend_compressed(existing_compressed, [
         StoredMessage(
             id=str(uuid.uuid4()),
             message=m,  # raw JSON from frontend
             role=m.get("role", "user"),
-            created_at=now
+            created_at=now,
+            token_count=estimate_tokens(m.get("content", "")),
         ) for m in new_messages
     ])
-    return compress_messages(messages)
+
+
+class BackgroundRunner:
+    """
+    Runs keyed background jobs, at most one in flight per key and a bounded number overall.
+    Failed jobs are retried `retries` times with exponential backoff.
+    """
+
+    def __init__(self, name: str, max_workers: int = 4, retries: int = 0, backoff: float = 0.5):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(max_workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, key: str, job) -> bool:
+        """Schedule `job()` unless one is already running for `key`."""
+        if key in self.tasks:
+            return False
+        self.tasks[key] = asyncio.create_task(self._run(key, job))
+        return True
+
+    async def _run(self, key: str, job):
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    async with self.semaphore:
+                        await job()
+                    return
+                except Exception as e:
+                    if attempt == self.retries:
+                        print(f"[{self.name}] Job for {key} failed: {e}")
+                        return
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+        finally:
+            self.tasks.pop(key, None)
+
+    async def drain(self):
+        if self.tasks:
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+
+compaction_runner = BackgroundRunner("compaction", max_workers=2)
 
 
 # Get Helpers
 
-async def get_conversation_messages(conversation_id: str, user_id: str):
-    query = "SELECT compressed_messages, user_id FROM conversations WHERE id = :conversation_id"
-    row = await database.fetch_one(query=query, values={"conversation_id": conversation_id})
+async def _fetch_conversation(conversation_id: str, user_id: str):
+    row = await db.fetch_one("conversations.with_segments", {"conversation_id": conversation_id})
 
-    if not row or not row["compressed_messages"]:
+    if not row or not (row["compressed_messages"] or row["segments"]):
         raise HTTPException(status_code=404, detail="No conversation found")
 
     if row["user_id"] != user_id:
         raise HTTPException(status_code=403, detail="You do not own this conversation")
 
-    return decompress_messages(row["compressed_messages"])
+    return row
+
+async def get_conversation_messages(conversation_id: str, user_id: str):
+    row = await _fetch_conversation(conversation_id, user_id)
+    messages = decompress_messages(row["compressed_messages"])
+    for segment in row["segments"]:
+        messages.extend(decompress_messages(segment))
+    return messages
+
+def iter_newest_first(row):
+    """Messages of a fetched conversation row, newest first, decoding one block at a time."""
+    for segment in reversed(row["segments"]):
+        yield from reversed(decompress_messages(segment))
+    for block in iter_blocks_reversed(row["compressed_messages"]):
+        yield from reversed(block)
+
+
+async def append_segment(conversation_id: str, user_id: str, messages: List[StoredMessage]) -> int:
+    """
+    Writes `messages` as one new segment, touching only the new data.
+    Returns how many segments the conversation has waiting for compaction.
+    """
+    row = await db.fetch_one(
+        "segments.append",
+        {
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "compressed": compress_messages(messages),
+            "message_count": len(messages),
+        },
+    )
+    if row:
+        return row["segment_count"]
+
+    owner = await db.fetch_one("conversations.owner", {"conversation_id": conversation_id})
+    if owner and owner["user_id"] != user_id:
+        raise HTTPException(status_code=403, detail="You do not own this conversation")
+    return 0
+
+
+async def compact_segments(conversation_id: str):
+    """Folds pending segments back into the conversation's single compressed blob."""
+    async with db.transaction():
+        row = await db.fetch_one("conversations.lock_compressed", {"conversation_id": conversation_id})
+        if not row:
+            return
+        segments = await db.fetch_all("segments.list", {"conversation_id": conversation_id})
+        if not segments:
+            return
+
+        messages = []
+        for segment in segments:
+            messages.extend(decompress_messages(segment["compressed"]))
+
+        await db.execute(
+            "conversations.set_compressed",
+            {
+                "compressed": extend_compressed(row["compressed_messages"], messages),
+                "conversation_id": conversation_id,
+            },
+        )
+        # Appends block on the row lock above, so anything newer than the last segment read stays put
+        await db.execute(
+            "segments.delete_through",
+            {"conversation_id": conversation_id, "last_id": segments[-1]["id"]},
+        )
+
+
+def encode_list_cursor(updated_at: datetime, conversation_id) -> str:
+    raw = json.dumps([updated_at.isoformat(), str(conversation_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_list_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, conversation_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), conversation_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _list_item(row) -> dict:
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "llm_model": row["llm_model"],
+        "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+    }
+
+
+def _message_size(message: StoredMessage) -> int:
+    content = message.message.get("content", "")
+    return len(content) if isinstance(content, str) else 0
 
 
 class ConversationManager:
     """Centralized async-safe manager for conversation storage and ephemeral LLM memory."""
 
-    def __init__(self, conversation_id: str, user_id: str):
+    def __init__(
+        self,
+        conversation_id: str,
+        user_id: str,
+        append_only: bool = APPEND_ONLY,
+        write_behind: bool = False,
+    ):
         self.conversation_id = conversation_id
         self.user_id = user_id
         self.messages: List[StoredMessage] = []
+        self.pending: List[StoredMessage] = []  # appended but not yet written
+        self.recent: List[StoredMessage] = []  # trailing window, kept when the full history isn't loaded
+        self.recent_loaded = False
+        self.recent_complete = False  # recent holds the whole history
+        self.summary = None  # rolling summary of messages up to and including summary_message_id
+        self.summary_message_id = None
+        self.summary_loaded = False
         self.lock = asyncio.Lock()
         self.loaded = False
+        self.append_only = append_only
+        self.write_behind = write_behind
+        self.flush_task = None
+        self.size_bytes = 0
+        self.created_at = time.monotonic()  # cached state is at most this old
 
     async def to_dict(self):
         async with self.lock:
@@ -77,48 +375,166 @@ class ConversationManager:
             if self.loaded:
                 return
             try:
-                self.messages = await get_conversation_messages(self.conversation_id, self.user_id)
+                row = await _fetch_conversation(self.conversation_id, self.user_id)
+                self.messages = decompress_messages(row["compressed_messages"])
+                for segment in row["segments"]:
+                    self.messages.extend(decompress_messages(segment))
+                self._set_summary(row["summary"], row["summary_message_id"])
             except HTTPException as e:
                 if e.status_code == 404:
                     self.messages = []  # <-- empty conversation
+                    self._set_summary(None, None)
                 else:
                     raise
+            # Anything appended before the load hasn't reached the DB yet
+            self.messages.extend(self.pending)
+            self.recent, self.recent_loaded = [], False
+            self.size_bytes = sum(_message_size(m) for m in self.messages)
             self.loaded = True
 
+    def _set_summary(self, summary, message_id):
+        self.summary = summary
+        self.summary_message_id = message_id
+        self.summary_loaded = True
+
+    async def set_summary(self, summary: str, message_id: str):
+        async with self.lock:
+            self._set_summary(summary, message_id)
+
+    def _summary_tokens(self) -> int:
+        return estimate_tokens(self.summary) if self.summary else 0
+
+    async def load_within_budget(self, budget: int, overflow_limit: int = 0):
+        """
+        Newest unsummarized messages fitting in `budget` tokens (less the rolling
+        summary), using stored per-message counts. Also returns how many older,
+        unsummarized messages were left out, counted up to `overflow_limit`.
+        A DB read keeps the overflowed messages too, so a later call with a smaller
+        budget or limit is answered from `recent`.
+        """
+        async with self.lock:
+            if self.summary_loaded and (self.loaded or self.recent_loaded):
+                source = self.messages if self.loaded else self.recent
+                window, overflow, exhausted = walk_within_budget(
+                    reversed(source), budget - self._summary_tokens(), self.summary_message_id, overflow_limit
+                )
+                if self.loaded or not exhausted or self.recent_complete:
+                    return window, overflow
+
+            walked: List[StoredMessage] = []
+
+            def record(messages):
+                for message in messages:
+                    walked.append(message)
+                    yield message
+
+            try:
+                row = await _fetch_conversation(self.conversation_id, self.user_id)
+                self._set_summary(row["summary"], row["summary_message_id"])
+                _, _, exhausted = walk_within_budget(
+                    record(iter_newest_first(row)), budget - self._summary_tokens(), self.summary_message_id, overflow_limit
+                )
+            except HTTPException as e:
+                if e.status_code == 404:
+                    self._set_summary(None, None)
+                    walked, exhausted = [], True
+                else:
+                    raise
+            at_marker = bool(walked) and walked[-1].id == self.summary_message_id
+            if at_marker:
+                walked.pop()
+            walked.reverse()
+            self.recent = walked + self.pending
+            self.recent_loaded = True
+            # Either way nothing older than `recent` can ever be part of a window
+            self.recent_complete = exhausted or at_marker
+            self.size_bytes = sum(_message_size(m) for m in self.recent)
+            # Pending messages aren't in the DB yet, so walk again to fit them in too
+            window, overflow, _ = walk_within_budget(
+                reversed(self.recent), budget - self._summary_tokens(), self.summary_message_id, overflow_limit
+            )
+            return window, overflow
+
     async def append(self, new_messages: List[Dict[str, Any]]):
         async with self.lock:
             now = datetime.utcnow()
             for m in new_messages:
-                self.messages.append(
-                    StoredMessage(
-                        id=str(uuid.uuid4()),
-                        message=m,
-                        role=m.get("role", "user"),
-                        created_at=now,
-                    )
+                stored = StoredMessage(
+                    id=str(uuid.uuid4()),
+                    message=m,
+                    role=m.get("role", "user"),
+                    created_at=now,
+                    token_count=estimate_tokens(m.get("content", "")),
                 )
+                self.pending.append(stored)
+                if self.loaded:
+                    self.messages.append(stored)
+                elif self.recent_loaded:
+                    self.recent.append(stored)
+                self.size_bytes += _message_size(stored)
+            if len(self.recent) > RECENT_KEEP:
+                self.recent = self.recent[-RECENT_KEEP:]
+                self.recent_complete = False
 
     async def persist(self):
+        """Writes pending messages now, or after a short delay in write-behind mode."""
+        if self.write_behind:
+            if self.flush_task is None or self.flush_task.done():
+                self.flush_task = asyncio.create_task(self._delayed_flush())
+            return
+        await self.flush()
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(WRITE_BEHIND_DELAY)
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"[ConversationManager] Write-behind flush failed for {self.conversation_id}: {e}")
+
+    def _discard_pending(self):
+        dropped = {m.id for m in self.pending}
+        self.messages = [m for m in self.messages if m.id not in dropped]
+        self.recent = [m for m in self.recent if m.id not in dropped]
+        self.size_bytes -= sum(_message_size(m) for m in self.pending)
+        self.pending = []
+
+    async def flush(self):
         async with self.lock:
+            if self.append_only:
+                # Only the new messages are written; no need to have loaded the history
+                if not self.pending:
+                    return
+                try:
+                    segment_count = await append_segment(self.conversation_id, self.user_id, self.pending)
+                except HTTPException as e:
+                    if e.status_code in (403, 404):
+                        # This user can never write here; keeping the messages would only
+                        # pin the manager in the registry and resend them on every flush
+                        self._discard_pending()
+                    raise
+                self.pending = []
+                if segment_count >= COMPACT_THRESHOLD:
+                    conversation_id = self.conversation_id
+                    compaction_runner.submit(conversation_id, lambda: compact_segments(conversation_id))
+                return
+
             compressed = compress_messages(self.messages)
-            await database.execute(
-                """
-                UPDATE conversations
-                SET compressed_messages = :compressed,
-                    updated_at = NOW()
-                WHERE id = :id
-                """,
+            await db.execute(
+                "conversations.save_compressed",
                 {"compressed": compressed, "id": self.conversation_id},
             )
+            # The full blob now holds everything, so any leftover segments are stale
+            await db.execute(
+                "segments.delete_all",
+                {"conversation_id": self.conversation_id},
+            )
+            self.pending = []
 
     async def create(self, llm_model: str):
         conversation_id = str(uuid.uuid4())
         now = datetime.utcnow()
-        await database.execute(
-            """
-            INSERT INTO conversations (id, user_id, llm_model, title, created_at, updated_at)
-            VALUES (:id, :user_id, :llm_model, NULL, :created_at, :updated_at)
-            """,
+        await db.execute(
+            "conversations.insert",
             {
                 "id": conversation_id,
                 "user_id": self.user_id,
@@ -130,38 +546,122 @@ class ConversationManager:
         self.conversation_id = conversation_id
         return conversation_id
 
-    async def list_for_user(self):
-        rows = await database.fetch_all(
-            """
-            SELECT id, title, llm_model, created_at, updated_at
-            FROM conversations
-            WHERE user_id = :user_id
-            ORDER BY updated_at DESC
-            """,
-            {"user_id": self.user_id},
+    async def list_for_user(self, limit: int = LIST_PAGE_SIZE, cursor: str = None):
+        """
+        One page of the user's conversations, most recently updated first. Pass the
+        returned cursor back to get the next page; it is None on the last page.
+        """
+        limit = max(1, min(limit, LIST_PAGE_MAX))
+        if cursor:
+            updated_at, last_id = decode_list_cursor(cursor)
+            rows = await db.fetch_all(
+                "conversations.page_after",
+                {"user_id": self.user_id, "updated_at": updated_at, "id": last_id, "limit": limit + 1},
+            )
+        else:
+            rows = await db.fetch_all("conversations.page_first", {"user_id": self.user_id, "limit": limit + 1})
+
+        page = rows[:limit]
+        next_cursor = encode_list_cursor(page[-1]["updated_at"], page[-1]["id"]) if len(rows) > limit else None
+        return [_list_item(r) for r in page], next_cursor
+
+    async def list_changed_since(self, since: datetime, limit: int = LIST_PAGE_MAX):
+        """Conversations updated after `since`, for incremental sidebar refreshes."""
+        if since.tzinfo is not None:
+            # updated_at is a naive UTC timestamp
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        rows = await db.fetch_all(
+            "conversations.changed_since",
+            {"user_id": self.user_id, "since": since, "limit": max(1, min(limit, LIST_PAGE_MAX))},
         )
-        return [
-            {"id": r["id"], "title": r["title"], "llm_model": r["llm_model"]}
-            for r in rows
-        ]
-    
-    
-
-    # --- Ephemeral LLM memory ---
-    async def get_memory_snapshot(self, recent_n: int = 20) -> list[dict]:
-        """Return last N messages formatted for LLM consumption."""
-
-        print(f"[ConversationManager] Loaded {len(self.messages)} messages for conversation {self.conversation_id}")
-
-        await self.load()
-        snapshot = []
-        recent_messages = self.messages[-recent_n:]
-        for m in recent_messages:
-            snapshot.append({
-                "role": m.role,
-                "content": m.message.get("content", "")
-            })
-        # Optional system prompt
-        system_prompt = "You are an assistant aware of the recent conversation context with the user."
-        snapshot.insert(0, {"role": "system", "content": system_prompt})
-        return snapshot
\ No newline at end of file
+        return [_list_item(r) for r in rows]
+
+    async def build_context(
+        self,
+        budget: int,
+        tail: List[dict],
+        system_prompt: str = SYSTEM_PROMPT,
+        overflow_limit: int = 0,
+    ):
+        """
+        System prompt, the rolling summary, as much unsummarized history as fits, then
+        `tail` (the current request plus any injected system/tool context). Everything
+        counts against `budget`. Returns the messages and the overflow count from
+        load_within_budget.
+        """
+        fixed = estimate_tokens(system_prompt) + sum(estimate_tokens(m.get("content", "")) for m in tail)
+        history, overflow = await self.load_within_budget(max(0, budget - fixed), overflow_limit)
+        messages = [{"role": "system", "content": system_prompt}]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages += [{"role": m.role, "content": m.message.get("content", "")} for m in history]
+        return messages + tail, overflow
+
+
+class ConversationRegistry:
+    """
+    Process-wide LRU of ConversationManager instances, so requests for the same
+    conversation share loaded state and one lock. Entries expire `ttl` seconds
+    after they were created, however often they are used, which bounds how stale
+    a worker's view can get when other workers write to the same conversation.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        ttl: float = CACHE_TTL,
+        write_behind: bool = WRITE_BEHIND,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.write_behind = write_behind
+        self.managers: "OrderedDict[tuple, ConversationManager]" = OrderedDict()
+
+    def get(self, conversation_id: str, user_id: str) -> ConversationManager:
+        # Keyed by user as well: a non-owner's manager never shares state with the owner's
+        key = (str(conversation_id), str(user_id))
+        now = time.monotonic()
+        manager = self.managers.get(key)
+        if manager is not None and now - manager.created_at > self.ttl and self._evictable(manager):
+            del self.managers[key]
+            manager = None
+        if manager is None:
+            manager = ConversationManager(conversation_id, user_id, write_behind=self.write_behind)
+            self.managers[key] = manager
+        else:
+            self.managers.move_to_end(key)
+        self._evict(now)
+        return manager
+
+    def _evictable(self, manager: ConversationManager) -> bool:
+        if manager.pending:
+            # Get it written first; it becomes evictable on a later pass
+            if manager.flush_task is None or manager.flush_task.done():
+                manager.flush_task = asyncio.create_task(manager._delayed_flush())
+            return False
+        return not manager.lock.locked()
+
+    def _evict(self, now: float):
+        total_bytes = sum(m.size_bytes for m in self.managers.values())
+        for key in list(self.managers):
+            manager = self.managers[key]
+            over = len(self.managers) > self.max_entries or total_bytes > self.max_bytes
+            expired = now - manager.created_at > self.ttl
+            if not (over or expired):
+                # Recency order isn't age order, so an older entry may still follow
+                continue
+            if self._evictable(manager):
+                del self.managers[key]
+                total_bytes -= manager.size_bytes
+
+    async def flush_all(self):
+        for manager in list(self.managers.values()):
+            try:
+                await manager.flush()
+            except Exception as e:
+                print(f"[ConversationRegistry] Flush failed for {manager.conversation_id}: {e}")
+
+
+conversation_registry = ConversationRegistry()
@@ -1,10 +1,18 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers.auth import auth
 from routers.llm import llm
+from routers.llm.llm import client_pool, reply_runner, summary_runner, title_runner
+from routers.llm.pipeline import stage_metrics
+from routers.llm.tooling import shutdown_pdf_pool
 from routers.user import profile, tokens, user
-from database import database
+from database import database, db
+from migrate import run_migrations
+from helpers import compaction_runner, conversation_registry
 from routers.conversations import conversations
+from search import close_client as close_search_client, cache_stats as search_cache_stats
+from routers.auth.auth_utils import auth_cache_stats, get_current_user
+from routers.auth.auth import password_hasher
 import os
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -41,10 +49,32 @@ app.include_router(conversations.router, prefix="/conversation", tags=["conversa
 async def root():
     return {"message": "Welcome to your API"}
 
+@app.get("/metrics/cache", dependencies=[Depends(get_current_user)])
+async def cache_metrics():
+    return {"auth": auth_cache_stats(), "search": search_cache_stats(), "favorites": user.llm_id_cache.stats()}
+
+@app.get("/metrics/db", dependencies=[Depends(get_current_user)])
+async def db_metrics():
+    return db.snapshot()
+
+@app.get("/metrics/chat", dependencies=[Depends(get_current_user)])
+async def chat_metrics():
+    return {"stages": stage_metrics()}
+
 @app.on_event("startup")
 async def startup():
     await database.connect()
+    await run_migrations()
 
 @app.on_event("shutdown")
 async def shutdown():
+    await reply_runner.drain()
+    await conversation_registry.flush_all()
+    await compaction_runner.drain()
+    await title_runner.drain()
+    await summary_runner.drain()
+    await client_pool.close()
+    await close_search_client()
+    shutdown_pdf_pool()
+    password_hasher.shutdown()
     await database.disconnect()
@@ -0,0 +1,158 @@
+"""
+Versioned schema migrations and a query-plan check.
+
+Migrations are the numbered .sql files in migrations/, applied in order and
+recorded in schema_migrations. They run at app startup and can be run by hand:
+
+    python migrate.py              # apply pending migrations
+    python migrate.py status       # list applied / pending
+    python migrate.py check-plans  # EXPLAIN every named query, fail on seq scans
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import List, Tuple
+
+from database import database
+from queries import QUERIES
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_LOCK_ID = 7_326_115  # arbitrary, shared by every app instance
+
+# Tables that grow with usage; a sequential scan over any of them fails check-plans
+LARGE_TABLES = tuple(
+    os.getenv("EXPLAIN_LARGE_TABLES", "users,llms,conversations,conversation_segments").split(",")
+)
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+)
+"""
+
+
+def load_migrations() -> List[Tuple[str, str, str, str]]:
+    """(version, name, sql, checksum) for each file, ordered by version."""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith(".sql"):
+            continue
+        version, _, name = filename[:-4].partition("_")
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            sql = f.read()
+        migrations.append((version, name, sql, hashlib.sha256(sql.encode()).hexdigest()))
+    return migrations
+
+
+async def run_migrations(verbose: bool = False) -> List[str]:
+    """
+    Applies pending migrations, each in its own transaction under an advisory lock so
+    concurrently starting instances apply every file exactly once. Returns the versions applied.
+    """
+    applied_now = []
+    async with database.connection() as connection:
+        conn = connection.raw_connection
+        await conn.execute(CREATE_MIGRATIONS_TABLE)
+        for version, name, sql, checksum in load_migrations():
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+                recorded = await conn.fetchval("SELECT checksum FROM schema_migrations WHERE version = $1", version)
+                if recorded is not None:
+                    if recorded != checksum:
+                        print(f"[migrate] {version}_{name} changed since it was applied; edits are not re-run")
+                    continue
+                # No arguments: simple query protocol, so a file may hold several statements
+                await conn.execute(sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+                    version, name, checksum,
+                )
+                applied_now.append(version)
+                if verbose:
+                    print(f"[migrate] applied {version}_{name}")
+    return applied_now
+
+
+async def migration_status():
+    async with database.connection() as connection:
+        conn = connection.raw_connection
+        await conn.execute(CREATE_MIGRATIONS_TABLE)
+        rows = await conn.fetch("SELECT version, applied_at FROM schema_migrations")
+    applied = {r["version"]: r["applied_at"] for r in rows}
+    for version, name, _, _ in load_migrations():
+        state = f"applied {applied[version]:%Y-%m-%d %H:%M}" if version in applied else "pending"
+        print(f"{version}_{name:40} {state}")
+
+
+def _positional(sql: str) -> str:
+    """Rewrites :name binds to $n (one number per distinct name), leaving :: casts alone."""
+    numbers = {}
+
+    def number(match):
+        return "$%d" % numbers.setdefault(match.group(1), len(numbers) + 1)
+
+    return re.sub(r"(?<![:\w]):(\w+)", number, sql)
+
+
+def _seq_scans(plan: dict):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+async def check_query_plans() -> List[str]:
+    """
+    EXPLAINs every named query as a generic plan (PostgreSQL 16+, no parameter values
+    needed) with sequential scans disabled, so the verdict doesn't depend on how much
+    data the local database holds: a Seq Scan that survives means no index can serve
+    the query. Returns one line per offending query.
+    """
+    failures = []
+    async with database.connection() as connection:
+        conn = connection.raw_connection
+        async with conn.transaction():
+            await conn.execute("SET LOCAL enable_seqscan = off")
+            for name, sql in QUERIES.items():
+                try:
+                    raw = await conn.fetchval(f"EXPLAIN (GENERIC_PLAN, FORMAT JSON) {_positional(sql)}")
+                except Exception as e:
+                    failures.append(f"{name}: EXPLAIN failed: {e}")
+                    continue
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                scanned = sorted({t for t in _seq_scans(plan) if t in LARGE_TABLES})
+                if scanned:
+                    failures.append(f"{name}: sequential scan on {', '.join(scanned)}")
+    return failures
+
+
+async def main(command: str):
+    await database.connect()
+    try:
+        if command == "migrate":
+            applied = await run_migrations(verbose=True)
+            print(f"[migrate] {len(applied)} migration(s) applied")
+        elif command == "status":
+            await migration_status()
+        elif command == "check-plans":
+            failures = await check_query_plans()
+            for failure in failures:
+                print(f"[check-plans] {failure}")
+            print(f"[check-plans] {len(QUERIES) - len(failures)}/{len(QUERIES)} queries OK")
+            return 1 if failures else 0
+        else:
+            print(__doc__)
+            return 2
+    finally:
+        await database.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "migrate")))
@@ -0,0 +1,24 @@
+-- Core tables. Existing deployments already have these; IF NOT EXISTS leaves them untouched.
+CREATE TABLE IF NOT EXISTS users (
+    id UUID PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT NOT NULL,
+    hf_tokens JSONB DEFAULT '[]'::jsonb,
+    favorites UUID[] DEFAULT '{}',
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS llms (
+    id UUID PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users (id),
+    llm_model TEXT,
+    title TEXT,
+    compressed_messages BYTEA,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
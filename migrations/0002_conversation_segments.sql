@@ -0,0 +1,11 @@
+-- Append-only message segments, folded back into conversations.compressed_messages by compaction.
+CREATE TABLE IF NOT EXISTS conversation_segments (
+    id BIGSERIAL PRIMARY KEY,
+    conversation_id UUID NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+    compressed BYTEA NOT NULL,
+    message_count INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS conversation_segments_conversation_id_idx
+    ON conversation_segments (conversation_id, id);
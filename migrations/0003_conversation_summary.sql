@@ -0,0 +1,3 @@
+-- Rolling conversation summary and the id of the last message it covers.
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary_message_id TEXT;
@@ -0,0 +1,27 @@
+-- Favourites upsert on the model name (INSERT ... ON CONFLICT (name)).
+-- Existing rows may repeat a name, which would fail the index: keep one id per name,
+-- repoint users.favorites at it (order kept, no repeats) and drop the rest first.
+CREATE TEMP TABLE llm_duplicates ON COMMIT DROP AS
+SELECT id, survivor
+FROM (
+    SELECT id, first_value(id) OVER (PARTITION BY name ORDER BY id) AS survivor
+    FROM llms
+) ranked
+WHERE id <> survivor;
+
+UPDATE users
+SET favorites = ARRAY(
+    SELECT favorite
+    FROM (
+        SELECT COALESCE(d.survivor, current.f) AS favorite, MIN(current.ord) AS ord
+        FROM unnest(users.favorites) WITH ORDINALITY AS current(f, ord)
+        LEFT JOIN llm_duplicates d ON d.id = current.f
+        GROUP BY 1
+    ) deduped
+    ORDER BY ord
+)
+WHERE favorites && ARRAY(SELECT id FROM llm_duplicates);
+
+DELETE FROM llms WHERE id IN (SELECT id FROM llm_duplicates);
+
+CREATE UNIQUE INDEX IF NOT EXISTS llms_name_key ON llms (name);
@@ -0,0 +1,11 @@
+-- HF tokens move from JSON text to jsonb so add/remove can run server-side.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'users' AND column_name = 'hf_tokens') <> 'jsonb' THEN
+        ALTER TABLE users ALTER COLUMN hf_tokens TYPE jsonb
+            USING COALESCE(NULLIF(hf_tokens::text, '')::jsonb, '[]'::jsonb);
+    END IF;
+END $$;
+
+ALTER TABLE users ALTER COLUMN hf_tokens SET DEFAULT '[]'::jsonb;
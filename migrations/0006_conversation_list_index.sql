@@ -0,0 +1,3 @@
+-- Covering index for the keyset-paginated sidebar listing and the owner's conversations by recency.
+CREATE INDEX IF NOT EXISTS conversations_user_updated_idx
+    ON conversations (user_id, updated_at DESC, id DESC) INCLUDE (title, llm_model);
@@ -0,0 +1,2 @@
+-- Signup and login look users up by username.
+CREATE INDEX IF NOT EXISTS users_username_idx ON users (username);
@@ -0,0 +1,213 @@
+# Every statement the app runs on a request path, by name. Going through
+# database.db keeps the SQL text stable (so asyncpg can reuse prepared statements
+# when the statement cache is on) and gives each query its own latency histogram.
+QUERIES = {
+    # --- users ---
+    "users.id_by_username": "SELECT id FROM users WHERE username = :username",
+    "users.credentials_by_username": "SELECT id, password FROM users WHERE username = :username",
+    "users.insert": """
+        INSERT INTO users (id, username, password, created_at)
+        VALUES (:id, :username, :password, NOW())
+    """,
+    "users.current": "SELECT id, username, hf_tokens, favorites FROM users WHERE id = :id",
+    # hf_tokens is a jsonb array of strings; each edit is one atomic UPDATE ... RETURNING.
+    # No row back means the guard failed (token already present / not present).
+    "hf_tokens.add": """
+        UPDATE users
+        SET hf_tokens = COALESCE(hf_tokens, '[]'::jsonb) || jsonb_build_array(CAST(:token AS text))
+        WHERE id = :user_id
+          AND NOT (COALESCE(hf_tokens, '[]'::jsonb) @> jsonb_build_array(CAST(:token AS text)))
+        RETURNING hf_tokens
+    """,
+    "hf_tokens.remove": """
+        UPDATE users
+        SET hf_tokens = hf_tokens - CAST(:token AS text)
+        WHERE id = :user_id
+          AND hf_tokens @> jsonb_build_array(CAST(:token AS text))
+        RETURNING hf_tokens
+    """,
+    "hf_tokens.add_many": """
+        UPDATE users
+        SET hf_tokens = COALESCE(hf_tokens, '[]'::jsonb) || COALESCE((
+            SELECT jsonb_agg(token ORDER BY ord)
+            FROM unnest(CAST(:tokens AS text[])) WITH ORDINALITY AS requested(token, ord)
+            WHERE NOT (COALESCE(users.hf_tokens, '[]'::jsonb) @> jsonb_build_array(token))
+        ), '[]'::jsonb)
+        WHERE id = :user_id
+        RETURNING hf_tokens
+    """,
+    "hf_tokens.remove_many": """
+        UPDATE users
+        SET hf_tokens = COALESCE(hf_tokens, '[]'::jsonb) - CAST(:tokens AS text[])
+        WHERE id = :user_id
+        RETURNING hf_tokens
+    """,
+    "users.add_favorite": """
+        UPDATE users
+        SET favorites = array_append(favorites, :llm_id)
+        WHERE id = :user_id
+          AND NOT (:llm_id = ANY(COALESCE(favorites, '{}')))
+    """,
+    "users.remove_favorite": """
+        UPDATE users
+        SET favorites = array_remove(favorites, :llm_id)
+        WHERE id = :user_id
+          AND :llm_id = ANY(favorites)
+    """,
+    # Upserts the model row and appends it to favorites in one statement. The no-op
+    # DO UPDATE makes RETURNING yield the id whether or not the row already existed.
+    "favorites.add_by_name": """
+        WITH llm AS (
+            INSERT INTO llms (id, name)
+            VALUES (gen_random_uuid(), :name)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id
+        ), updated AS (
+            UPDATE users
+            SET favorites = array_append(users.favorites, llm.id)
+            FROM llm
+            WHERE users.id = :user_id
+              AND NOT (llm.id = ANY(COALESCE(users.favorites, '{}')))
+            RETURNING users.id
+        )
+        SELECT id AS llm_id FROM llm
+    """,
+    "favorites.remove_by_name": """
+        WITH llm AS (
+            SELECT id FROM llms WHERE name = :name
+        ), updated AS (
+            UPDATE users
+            SET favorites = array_remove(users.favorites, llm.id)
+            FROM llm
+            WHERE users.id = :user_id
+              AND llm.id = ANY(users.favorites)
+            RETURNING users.id
+        )
+        SELECT id AS llm_id FROM llm
+    """,
+    # Bulk variants take a de-duplicated text[] of model names and keep favorites ordered.
+    "favorites.add_many": """
+        WITH llm AS (
+            INSERT INTO llms (id, name)
+            SELECT gen_random_uuid(), name FROM unnest(CAST(:names AS text[])) AS name
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id, name
+        ), updated AS (
+            UPDATE users
+            SET favorites = COALESCE(users.favorites, '{}') || ARRAY(
+                SELECT llm.id FROM llm
+                JOIN unnest(CAST(:names AS text[])) WITH ORDINALITY AS requested(name, ord)
+                  ON requested.name = llm.name
+                WHERE NOT (llm.id = ANY(COALESCE(users.favorites, '{}')))
+                ORDER BY requested.ord
+            )
+            WHERE users.id = :user_id
+            RETURNING users.id
+        )
+        SELECT id AS llm_id, name FROM llm
+    """,
+    "favorites.remove_many": """
+        WITH llm AS (
+            SELECT id, name FROM llms WHERE name = ANY(CAST(:names AS text[]))
+        ), updated AS (
+            UPDATE users
+            SET favorites = ARRAY(
+                SELECT f FROM unnest(users.favorites) WITH ORDINALITY AS current(f, ord)
+                WHERE f <> ALL(ARRAY(SELECT id FROM llm))
+                ORDER BY current.ord
+            )
+            WHERE users.id = :user_id
+            RETURNING users.id
+        )
+        SELECT id AS llm_id, name FROM llm
+    """,
+
+    # --- conversations ---
+    "conversations.insert": """
+        INSERT INTO conversations (id, user_id, llm_model, title, created_at, updated_at)
+        VALUES (:id, :user_id, :llm_model, NULL, :created_at, :updated_at)
+    """,
+    # Sidebar listing, keyset-paginated newest first. All three are answered from
+    # conversations_user_updated_idx (user_id, updated_at DESC, id DESC) INCLUDE (title, llm_model)
+    # without a sort; :limit is one more than the page size to detect a next page.
+    "conversations.page_first": """
+        SELECT id, title, llm_model, updated_at
+        FROM conversations
+        WHERE user_id = :user_id
+        ORDER BY updated_at DESC, id DESC
+        LIMIT :limit
+    """,
+    "conversations.page_after": """
+        SELECT id, title, llm_model, updated_at
+        FROM conversations
+        WHERE user_id = :user_id
+          AND (updated_at, id) < (:updated_at, :id)
+        ORDER BY updated_at DESC, id DESC
+        LIMIT :limit
+    """,
+    "conversations.changed_since": """
+        SELECT id, title, llm_model, updated_at
+        FROM conversations
+        WHERE user_id = :user_id
+          AND updated_at > :since
+        ORDER BY updated_at DESC, id DESC
+        LIMIT :limit
+    """,
+    "conversations.owner": "SELECT user_id FROM conversations WHERE id = :conversation_id",
+    "conversations.title": "SELECT title FROM conversations WHERE id = :id",
+    "conversations.set_title": """
+        UPDATE conversations
+        SET title = :title, updated_at = :updated_at
+        WHERE id = :id
+    """,
+    "conversations.set_summary": """
+        UPDATE conversations SET summary = :summary, summary_message_id = :message_id WHERE id = :id
+    """,
+    "conversations.with_segments": """
+        SELECT c.compressed_messages, c.user_id, c.summary, c.summary_message_id,
+               ARRAY(
+                   SELECT s.compressed FROM conversation_segments s
+                   WHERE s.conversation_id = c.id
+                   ORDER BY s.id
+               ) AS segments
+        FROM conversations c
+        WHERE c.id = :conversation_id
+    """,
+    "conversations.lock_compressed": """
+        SELECT compressed_messages FROM conversations WHERE id = :conversation_id FOR UPDATE
+    """,
+    "conversations.set_compressed": """
+        UPDATE conversations SET compressed_messages = :compressed WHERE id = :conversation_id
+    """,
+    "conversations.save_compressed": """
+        UPDATE conversations
+        SET compressed_messages = :compressed,
+            updated_at = NOW()
+        WHERE id = :id
+    """,
+
+    # --- conversation_segments ---
+    "segments.append": """
+        WITH owned AS (
+            UPDATE conversations
+            SET updated_at = NOW()
+            WHERE id = :conversation_id AND user_id = :user_id
+            RETURNING id
+        )
+        INSERT INTO conversation_segments (conversation_id, compressed, message_count)
+        SELECT id, :compressed, :message_count FROM owned
+        RETURNING (
+            SELECT COUNT(*) FROM conversation_segments
+            WHERE conversation_id = :conversation_id
+        ) + 1 AS segment_count
+    """,
+    "segments.list": """
+        SELECT id, compressed FROM conversation_segments
+        WHERE conversation_id = :conversation_id
+        ORDER BY id
+    """,
+    "segments.delete_through": """
+        DELETE FROM conversation_segments WHERE conversation_id = :conversation_id AND id <= :last_id
+    """,
+    "segments.delete_all": "DELETE FROM conversation_segments WHERE conversation_id = :conversation_id",
+}
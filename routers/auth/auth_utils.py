@@ -1,8 +1,10 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import Request, HTTPException, status
-from database import database
+from database import db
+from cache import TTLCache
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,6 +13,13 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 240))
 
+# Short-lived caches so per-turn requests skip JWT decoding and the users lookup.
+# User rows are invalidated whenever hf_tokens or favorites change.
+TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", 60))
+USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 30))
+token_cache = TTLCache("auth_tokens", max_entries=10000, ttl=TOKEN_CACHE_TTL)
+user_cache = TTLCache("auth_users", max_entries=10000, ttl=USER_CACHE_TTL)
+
 
 def create_access_token(username: str):
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -20,11 +29,28 @@ def create_access_token(username: str):
 
 
 def verify_token(token: str):
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
     except JWTError:
         return None
+    user_id = payload.get("sub")
+    if user_id:
+        # Never cache a token past its own expiry
+        ttl = min(TOKEN_CACHE_TTL, payload.get("exp", 0) - time.time())
+        if ttl > 0:
+            token_cache.set(token, user_id, ttl=ttl)
+    return user_id
+
+
+def invalidate_user(user_id):
+    user_cache.delete(str(user_id))
+
+
+def auth_cache_stats() -> dict:
+    return {token_cache.name: token_cache.stats(), user_cache.name: user_cache.stats()}
 
 
 async def get_current_user(request: Request):
@@ -39,9 +65,15 @@ async def get_current_user(request: Request):
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
-    query = "SELECT * FROM users WHERE id = :id"
-    user = await database.fetch_one(query=query, values={"id": user_id})
-    if not user:
+    user = user_cache.get(str(user_id))
+    if user is not None:
+        return user
+
+    # Only what the routes need; the password hash never leaves the auth handlers
+    row = await db.fetch_one("users.current", {"id": user_id})
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
 
+    user = dict(row._mapping)
+    user_cache.set(str(user_id), user)
     return user
\ No newline at end of file
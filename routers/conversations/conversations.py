@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Body, Depends
+from fastapi import APIRouter, Body, Depends, Query
+from datetime import datetime
 from routers.auth.auth_utils import get_current_user
 from schemas import CreateConversationRequest
-from typing import List, Dict, Any
-from helpers import ConversationManager
+from typing import List, Dict, Any, Optional
+from helpers import LIST_PAGE_MAX, LIST_PAGE_SIZE, ConversationManager, conversation_registry
 
 router = APIRouter()
 
@@ -12,15 +13,16 @@ async def save_chunk(
     messages: List[Dict[str, Any]] = Body(...),
     current_user: dict = Depends(get_current_user),
 ):
-    manager = ConversationManager(conversation_id, current_user["id"])
-    await manager.load()
+    manager = conversation_registry.get(conversation_id, current_user["id"])
+    if not manager.append_only:
+        await manager.load()
     await manager.append(messages)
     await manager.persist()
     return {"status": "ok", "chunk_size": len(messages)}
 
 @router.get("/{conversation_id}/chunk")
 async def load_chunks(conversation_id: str, current_user: dict = Depends(get_current_user)):
-    manager = ConversationManager(conversation_id, current_user["id"])
+    manager = conversation_registry.get(conversation_id, current_user["id"])
     await manager.load()
     return await manager.to_dict()
 
@@ -31,6 +33,18 @@ async def create_conversation(req: CreateConversationRequest, current_user: dict
     return {"id": new_id, "title": None}
 
 @router.get("/list")
-async def list_conversations(current_user: dict = Depends(get_current_user)):
+async def list_conversations(
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    changed_since: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Newest-first page of conversations plus `next_cursor` for the following page.
+    With `changed_since`, returns only conversations updated after that time instead.
+    """
     manager = ConversationManager(conversation_id="", user_id=current_user["id"])
-    return {"conversations": await manager.list_for_user()}
\ No newline at end of file
+    if changed_since is not None:
+        return {"conversations": await manager.list_changed_since(changed_since, limit)}
+    conversations, next_cursor = await manager.list_for_user(limit, cursor)
+    return {"conversations": conversations, "next_cursor": next_cursor}
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Approximate nearest-neighbour indexes for VectorDB.
+
+An index maps VectorDB rows to candidate sets. VectorDB keeps the vectors and
+does the exact scoring on those candidates, so an index only has to provide:
+
+    ready                       -> bool, False until it can serve queries
+    add(rows, vectors)          -> register new rows (already normalized)
+    rebuild(vectors)            -> re-register every row, e.g. after a repack
+    candidates(query)           -> array of rows worth scoring for one query
+    save(directory) / load(directory)
+"""
+import json
+import os
+from typing import List
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file index. Rows are bucketed by their nearest k-means centroid and
+    a query only scores the rows in its `nprobe` closest buckets; raising nprobe
+    trades latency for recall. Until `train_size` rows have been added the index
+    stays untrained and VectorDB falls back to exact search.
+    """
+
+    def __init__(self, nlist: int = 256, nprobe: int = 8, train_size: int = 8192, iterations: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: np.ndarray = None
+        self.lists: List[List[np.ndarray]] = []  # per bucket, chunks of rows
+        self.pending_rows: List[np.ndarray] = []
+        self.pending_vectors: List[np.ndarray] = []
+        self.pending_count = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+
+    def _train(self, vectors: np.ndarray):
+        """Spherical k-means on a sample of the (normalized) vectors."""
+        rng = np.random.default_rng(self.seed)
+        nlist = min(self.nlist, len(vectors))
+        sample = vectors[rng.choice(len(vectors), min(len(vectors), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty buckets so every centroid stays useful
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = sums / norms
+        self.centroids = centroids.astype(np.float32)
+        self.lists = [[] for _ in range(len(self.centroids))]
+
+    def _assign(self, rows: np.ndarray, vectors: np.ndarray):
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        for bucket in range(len(self.centroids)):
+            start, end = bounds[bucket], bounds[bucket + 1]
+            if start < end:
+                self.lists[bucket].append(rows[order[start:end]])
+
+    def add(self, rows, vectors: np.ndarray):
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.ready:
+            self._assign(rows, vectors)
+            return
+        self.pending_rows.append(rows)
+        self.pending_vectors.append(np.array(vectors, dtype=np.float32))
+        self.pending_count += len(rows)
+        if self.pending_count >= self.train_size:
+            all_rows = np.concatenate(self.pending_rows)
+            all_vectors = np.concatenate(self.pending_vectors)
+            self.pending_rows, self.pending_vectors, self.pending_count = [], [], 0
+            self._train(all_vectors)
+            self._assign(all_rows, all_vectors)
+
+    def rebuild(self, vectors: np.ndarray):
+        """Re-registers rows 0..len(vectors) against the existing centroids."""
+        if not self.ready:
+            self.pending_rows, self.pending_vectors, self.pending_count = [], [], 0
+            self.add(np.arange(len(vectors)), vectors)
+            return
+        self.lists = [[] for _ in range(len(self.centroids))]
+        self._assign(np.arange(len(vectors), dtype=np.int64), vectors)
+
+    def _bucket(self, bucket: int) -> np.ndarray:
+        chunks = self.lists[bucket]
+        if len(chunks) > 1:
+            # Fold incremental inserts into one array on first read
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0] if chunks else np.empty(0, np.int64)
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        nprobe = min(self.nprobe, len(self.centroids))
+        similarity = self.centroids @ query
+        probe = np.argpartition(-similarity, nprobe - 1)[:nprobe]
+        return np.concatenate([self._bucket(int(b)) for b in probe])
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        params = {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "train_size": self.train_size,
+            "iterations": self.iterations,
+            "seed": self.seed,
+            "trained": self.ready,
+        }
+        if self.ready:
+            np.save(os.path.join(directory, "ivf_centroids.npy"), self.centroids)
+            rows = [self._bucket(b) for b in range(len(self.centroids))]
+            np.save(os.path.join(directory, "ivf_rows.npy"), np.concatenate(rows) if rows else np.empty(0, np.int64))
+            np.save(os.path.join(directory, "ivf_bounds.npy"), np.cumsum([0] + [len(r) for r in rows]))
+        with open(os.path.join(directory, "ivf.json"), "w") as f:
+            json.dump(params, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "IVFIndex":
+        with open(os.path.join(directory, "ivf.json")) as f:
+            params = json.load(f)
+        trained = params.pop("trained")
+        index = cls(**params)
+        if trained:
+            mode = "r" if mmap else None
+            index.centroids = np.load(os.path.join(directory, "ivf_centroids.npy"), mmap_mode=mode)
+            rows = np.load(os.path.join(directory, "ivf_rows.npy"), mmap_mode=mode)
+            bounds = np.load(os.path.join(directory, "ivf_bounds.npy"))
+            index.lists = [[rows[bounds[b]:bounds[b + 1]]] for b in range(len(index.centroids))]
+        return index
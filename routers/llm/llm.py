@@ -1,22 +1,111 @@
 from fastapi.responses import StreamingResponse
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from openai import OpenAI
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Request
+from openai import AsyncOpenAI
 from datetime import datetime
-from schemas import ChatRequest
-from database import database
-from helpers import ConversationManager
-from .tooling import LLMTooling# chunk_and_embed, read_pdf
-from typing import List
+from collections import OrderedDict
+from schemas import ChatRequest, EmbedRequest
+from database import db
+from helpers import (
+    BackgroundRunner,
+    ConversationManager,
+    conversation_registry,
+    estimate_tokens,
+    get_conversation_messages,
+    take_within_budget,
+)
+from routers.auth.auth_utils import get_current_user
+from .pipeline import StageGraph
+from .sse import SSE_HEADERS, sse_stream
+from .tooling import (
+    EmbeddingBatcher, LLMTooling, get_vector_store, ingest_pdf, save_vector_store, vector_store_lock,
+)
+from typing import List, Dict, Optional
+import asyncio
+import httpx
+import json
+import os
+import shutil
+import tempfile
+import uuid
 
 router = APIRouter()
 
+HF_BASE_URL = "https://router.huggingface.co/v1"
+
+
+class ClientPool:
+    """
+    One keep-alive HTTP connection pool per base URL, shared by cached
+    AsyncOpenAI clients keyed by (base URL, token).
+    """
+
+    def __init__(
+        self,
+        max_clients: int = int(os.getenv("LLM_MAX_CLIENTS", 512)),
+        max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", 512)),
+        max_keepalive: int = int(os.getenv("LLM_MAX_KEEPALIVE", 128)),
+    ):
+        self.max_clients = max_clients
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=30,
+        )
+        self.http_clients: Dict[str, httpx.AsyncClient] = {}
+        self.clients: "OrderedDict[tuple, AsyncOpenAI]" = OrderedDict()
+
+    def get(self, api_key: str, base_url: str = HF_BASE_URL) -> AsyncOpenAI:
+        key = (base_url, api_key)
+        client = self.clients.get(key)
+        if client is not None:
+            self.clients.move_to_end(key)
+            return client
+
+        http_client = self.http_clients.get(base_url)
+        if http_client is None:
+            http_client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+            self.http_clients[base_url] = http_client
+
+        client = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client)
+        self.clients[key] = client
+        # Evicted clients are just dropped; closing them would close the shared pool
+        while len(self.clients) > self.max_clients:
+            self.clients.popitem(last=False)
+        return client
+
+    async def close(self):
+        self.clients.clear()
+        for http_client in self.http_clients.values():
+            await http_client.aclose()
+        self.http_clients.clear()
+
+
+client_pool = ClientPool()
+title_runner = BackgroundRunner("titles", max_workers=int(os.getenv("TITLE_WORKERS", 4)), retries=2)
+summary_runner = BackgroundRunner("summaries", max_workers=int(os.getenv("SUMMARY_WORKERS", 2)), retries=1)
+# Saves partial replies after a client disconnect or upstream failure. A failed write
+# leaves the messages pending on the manager, so the next flush picks them up.
+reply_runner = BackgroundRunner("replies", max_workers=int(os.getenv("REPLY_WORKERS", 8)))
+
+# The chat stream can save the user turn and the reply itself, in one write at stream end,
+# so clients don't need to upload replies through /conversation/{id}/chunk. Opt-in (per
+# request with ?persist=true) until clients stop posting replies themselves.
+CHAT_PERSIST_REPLIES = os.getenv("CHAT_PERSIST_REPLIES", "0") == "1"
+
+# Rolling summaries: once this many unsummarized messages no longer fit the prompt,
+# older turns are folded into conversations.summary in the background.
+SUMMARY_THRESHOLD = int(os.getenv("SUMMARY_THRESHOLD", 16))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", 400))
+
+
 class LLM:
-    def __init__(self, model_id: str, hf_token: str, tooling: LLMTooling = None):
+    def __init__(self, model_id: str, hf_token: str, tooling: LLMTooling = None, base_url: str = HF_BASE_URL):
         self.model_id = model_id
-        self.client = OpenAI(
-            base_url="https://router.huggingface.co/v1",
-            api_key=hf_token,
-        )
+        self.client = client_pool.get(hf_token, base_url)
         self.tooling = tooling
 
     
@@ -27,7 +116,7 @@ class LLM:
             {"role": "user", "content": f"Generate a short concise title for the following: {conversation_snippet}"}
         ]
 
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.model_id,
             messages=messages,
             max_tokens=12,
@@ -45,6 +134,27 @@ class LLM:
         return "Untitled Conversation"  # fail-fast
     
     
+    async def summarize(self, previous_summary: str, messages: list[dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = (
+            f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+            f"New conversation turns:\n{transcript}\n\n"
+            "Rewrite the summary so it also covers the new turns. Keep facts, decisions, "
+            "names and open questions; drop small talk."
+        )
+        response = await self.client.chat.completions.create(
+            model=self.model_id,
+            messages=[
+                {"role": "system", "content": "You maintain a concise running summary of a conversation."},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=SUMMARY_MAX_TOKENS,
+        )
+        content = response.choices[0].message.content if response.choices else None
+        if not content or not content.strip():
+            raise ValueError("Empty summary returned")
+        return content.strip()
+
     async def stream_response(self, messages: list[dict]):
         last_user_input = messages[-1]["content"] if messages else ""
         if self.tooling:
@@ -52,7 +162,7 @@ class LLM:
             if context:
                 messages.append({"role": "system", "content": context})
 
-        stream = self.client.chat.completions.create(
+        stream = await self.client.chat.completions.create(
             model=self.model_id,
             messages=messages,
             stream=True,
@@ -60,7 +170,7 @@ class LLM:
 
         assistant_message = {"role": "assistant", "content": ""}
 
-        for chunk in stream:
+        async for chunk in stream:
             if not chunk.choices or len(chunk.choices) == 0:
                 continue
             delta = chunk.choices[0].delta
@@ -71,6 +181,39 @@ class LLM:
                 yield delta_content
 
 
+class EmbeddingModel:
+    """Embeddings through the same pooled OpenAI-compatible clients as chat."""
+
+    def __init__(self, model_id: str, hf_token: str, base_url: str = HF_BASE_URL):
+        self.model_id = model_id
+        self.client = client_pool.get(hf_token, base_url)
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        response = await self.client.embeddings.create(model=self.model_id, input=texts)
+        return [item.embedding for item in response.data]
+
+    async def embed(self, text: str) -> List[float]:
+        return (await self.embed_many([text]))[0]
+
+
+embedding_batchers: "OrderedDict[tuple, EmbeddingBatcher]" = OrderedDict()
+MAX_EMBEDDING_BATCHERS = 256
+
+
+def get_embedding_batcher(model_id: str, hf_token: str) -> EmbeddingBatcher:
+    """One batcher per (model, token), so concurrent requests share batches and cache."""
+    key = (model_id, hf_token)
+    batcher = embedding_batchers.get(key)
+    if batcher is None:
+        batcher = EmbeddingBatcher(EmbeddingModel(model_id=model_id, hf_token=hf_token))
+        embedding_batchers[key] = batcher
+        while len(embedding_batchers) > MAX_EMBEDDING_BATCHERS:
+            embedding_batchers.popitem(last=False)
+    else:
+        embedding_batchers.move_to_end(key)
+    return batcher
+
+
 async def try_generate_title(conversation_id: str, llm: LLM, messages: list[dict]):
     """
     Attempts to auto-generate a concise conversation title from the first user message.
@@ -85,84 +228,223 @@ async def try_generate_title(conversation_id: str, llm: LLM, messages: list[dict
         return
 
     # --- Check if conversation already has a title ---
-    conversation_record = await database.fetch_one(
-        "SELECT title FROM conversations WHERE id = :id",
-        {"id": conversation_id}
-    )
+    conversation_record = await db.fetch_one("conversations.title", {"id": conversation_id})
     if not conversation_record or conversation_record["title"]:
         return
 
     # --- Generate and store title ---
     title = await llm.generate_conversation_title(first_user_message)
-    await database.execute(
-        """
-        UPDATE conversations
-        SET title = :title, updated_at = :updated_at
-        WHERE id = :id
-        """,
+    await db.execute(
+        "conversations.set_title",
         {"title": title, "updated_at": datetime.utcnow(), "id": conversation_id}
     )
 
-async def build_llm_memory(manager: ConversationManager, recent_n: int = 20):
+# Prompt token budgets. MODEL_CONTEXT_BUDGETS is a JSON object of model id -> tokens;
+# leave headroom under the model's context window for the reply.
+DEFAULT_CONTEXT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000))
+MODEL_CONTEXT_BUDGETS: Dict[str, int] = json.loads(os.getenv("MODEL_CONTEXT_BUDGETS", "{}"))
+
+
+def context_budget(model_id: str) -> int:
+    return MODEL_CONTEXT_BUDGETS.get(model_id or "", DEFAULT_CONTEXT_BUDGET)
+
+
+async def update_summary(manager: ConversationManager, llm: LLM, keep_budget: int):
+    """
+    Folds unsummarized messages older than the newest `keep_budget` tokens into the
+    conversation's rolling summary, in chunks of SUMMARY_CHUNK_TOKENS.
+    """
+    messages = await get_conversation_messages(manager.conversation_id, manager.user_id)
+    start = 0
+    if manager.summary_message_id:
+        start = next((i + 1 for i, m in enumerate(messages) if m.id == manager.summary_message_id), 0)
+    unsummarized = messages[start:]
+    keep = take_within_budget(unsummarized, keep_budget)
+    to_summarize = unsummarized[:len(unsummarized) - len(keep)]
+    if len(to_summarize) < SUMMARY_THRESHOLD:
+        return
+
+    summary = manager.summary
+    chunk, chunk_tokens = [], 0
+    for i, m in enumerate(to_summarize):
+        chunk.append({"role": m.role, "content": m.message.get("content", "")})
+        chunk_tokens += m.token_count or estimate_tokens(chunk[-1]["content"])
+        if chunk_tokens >= SUMMARY_CHUNK_TOKENS or i == len(to_summarize) - 1:
+            summary = await llm.summarize(summary, chunk)
+            chunk, chunk_tokens = [], 0
+
+    last_id = to_summarize[-1].id
+    await db.execute(
+        "conversations.set_summary",
+        {"summary": summary, "message_id": last_id, "id": manager.conversation_id},
+    )
+    await manager.set_summary(summary, last_id)
+
+
+async def build_llm_memory(manager: ConversationManager, llm: LLM, tail: list[dict]):
     """
     Returns a list of messages ready to feed into the LLM:
-    - Prepends a system message with context of the last recent_n messages.
+    - A system prompt and the rolling summary, then the newest unsummarized messages
+      that fit the model's token budget
+    - `tail` (the request's messages plus injected context), which counts against the same budget
+    Schedules a summary update when too much unsummarized history no longer fits.
     """
-    await manager.load()
-    
-    # Grab last N messages
-    recent_messages = manager.messages[-recent_n:]
-    
-    # Flatten into LLM chat format
-    llm_messages = []
-    for m in recent_messages:
-        llm_messages.append({
-            "role": m.role,
-            "content": m.message.get("content", "")
-        })
-    
-    # Optional: prepend a system message that gives context
-    system_prompt = "You are an assistant aware of the recent conversation context with the user."
-    llm_messages.insert(0, {"role": "system", "content": system_prompt})
-    
-    return llm_messages
+    budget = context_budget(llm.model_id)
+    conversation, overflow = await manager.build_context(budget, tail, overflow_limit=SUMMARY_THRESHOLD)
+    if overflow >= SUMMARY_THRESHOLD:
+        summary_runner.submit(
+            str(manager.conversation_id),
+            lambda: update_summary(manager, llm, budget // 2),
+        )
+    return conversation
+
+async def save_turn(manager: ConversationManager, messages: list[dict]):
+    if not manager.append_only:
+        await manager.load()
+    await manager.append(messages)
+    await manager.persist()
+
 
 @router.post("/chat/stream")
-async def chat_stream(req: ChatRequest, conversation_id: str):
-    async def event_generator():
-        # --- Fetch user_id from conversation record ---
-        conversation_record = await database.fetch_one(
-            "SELECT user_id FROM conversations WHERE id = :conversation_id",
-            {"conversation_id": conversation_id}
-        )
+async def chat_stream(
+    req: ChatRequest,
+    conversation_id: str,
+    request: Request,
+    sse: bool = False,
+    persist: Optional[bool] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Streams the reply as plain text, or as Server-Sent Events with `?sse=true` or
+    `Accept: text/event-stream` (coalesced delta frames, heartbeats, error and done frames).
+    With `persist=true` (or CHAT_PERSIST_REPLIES=1), the last user message and the reply
+    are saved when the stream ends; a reply cut short after its first delta is saved as far
+    as it got. Per-stage timings of the request pipeline are reported in the SSE done frame.
+    """
+    persist = CHAT_PERSIST_REPLIES if persist is None else persist
+    metadata = {"conversation_id": conversation_id, "model": req.modelId}
+    request_messages = [m.dict() for m in req.conversation]
+    last_user_input = request_messages[-1]["content"] if request_messages else ""
+
+    # The web search needs only the user input, so it overlaps the ownership check. The
+    # check itself finishes before the response starts, so a refusal is a real 403/404.
+    tools_task = asyncio.create_task(LLMTooling().handle_input(last_user_input))
+    try:
+        conversation_record = await db.fetch_one("conversations.owner", {"conversation_id": conversation_id})
         if not conversation_record:
             raise HTTPException(status_code=404, detail="Conversation not found")
-        internal_user_id = conversation_record["user_id"]
+        if str(conversation_record["user_id"]) != str(current_user["id"]):
+            raise HTTPException(status_code=403, detail="You do not own this conversation")
+    except BaseException:
+        tools_task.cancel()
+        raise
+    manager = conversation_registry.get(conversation_id, current_user["id"])
+
+    async def event_generator():
+        llm = LLM(model_id=req.modelId, hf_token=req.hfToken)
+        budget = context_budget(llm.model_id)
+
+        # --- Stages run as a dependency graph: the web search and date note need only the
+        # user input, so they run alongside the history load instead of after it ---
+        async def date_note():
+            if "current date" in last_user_input.lower() or "today" in last_user_input.lower():
+                return {"role": "system", "content": f"The current date is {datetime.now().strftime('%B %d, %Y')}."}
+            return None
 
-        # --- Load ephemeral memory ---
-        manager = ConversationManager(conversation_id, internal_user_id)
-        memory_snapshot = await manager.get_memory_snapshot(recent_n=20)
-        conversation = memory_snapshot + [m.dict() for m in req.conversation]
+        async def tools():
+            tool_context = await tools_task
+            return {"role": "system", "content": tool_context} if tool_context else None
 
-        # --- Instantiate LLM with tooling ---
-        tooling = LLMTooling()
-        # Add other tools like vector DB or RAG later as needed
+        async def history():
+            # Warms the manager with everything that could fit before the tool context is
+            # known. The memory stage's smaller budget is then answered from that cached window
+            # (see load_within_budget), so the conversation is fetched at most once per turn.
+            fixed = sum(estimate_tokens(m.get("content", "")) for m in request_messages)
+            await manager.load_within_budget(max(0, budget - fixed), SUMMARY_THRESHOLD)
 
-        llm = LLM(model_id=req.modelId, hf_token=req.hfToken, tooling=tooling)
+        async def memory(date_message, tool_message, _):
+            # Tool context counts against the prompt budget with everything else
+            injected = [m for m in (date_message, tool_message) if m]
+            return await build_llm_memory(manager, llm, request_messages + injected)
 
-        # --- Attempt to generate title ---
-        await try_generate_title(conversation_id, llm, conversation)
+        async def title(conversation):
+            # Generated in the background, off the first-token path
+            title_messages = list(conversation)
+            title_runner.submit(conversation_id, lambda: try_generate_title(conversation_id, llm, title_messages))
 
-        # --- Inject dynamic system message for current date ---
-        last_user_input = conversation[-1]["content"] if conversation else ""
-        if "current date" in last_user_input.lower() or "today" in last_user_input.lower():
-            conversation.append({
-                "role": "system",
-                "content": f"The current date is {datetime.now().strftime('%B %d, %Y')}.",
-            })
+        graph = (
+            StageGraph("chat")
+            .add("date", date_note)
+            .add("tools", tools)
+            .add("history", history)
+            .add("memory", memory, deps=["date", "tools", "history"])
+            .add("title", title, deps=["memory"])
+        )
+        try:
+            results = await graph.run()
+        finally:
+            metadata["stages"] = graph.timings
+        conversation = results["memory"]
 
         # --- Stream the assistant response ---
-        async for delta in llm.stream_response(conversation):
-            yield delta
+        user_turn = []
+        if request_messages and request_messages[-1]["role"] == "user":
+            user_turn.append({"role": "user", "content": last_user_input})
+        reply = []
+        try:
+            async for delta in llm.stream_response(conversation):
+                reply.append(delta)
+                yield delta
+        except BaseException:
+            # Client went away or upstream failed; keep what was streamed so far. A failure
+            # before the first delta saves nothing, so a retry doesn't store the user turn
+            # twice. Awaiting here could be cancelled along with the request, so hand the write off.
+            if persist and reply:
+                turn = user_turn + [{"role": "assistant", "content": "".join(reply), "partial": True}]
+                reply_runner.submit(f"{conversation_id}:{uuid.uuid4()}", lambda: save_turn(manager, turn))
+            raise
+
+        if persist:
+            await save_turn(manager, user_turn + [{"role": "assistant", "content": "".join(reply)}])
+            metadata["persisted"] = True
+
+    if sse or "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(sse_stream(event_generator(), metadata), media_type="text/event-stream", headers=SSE_HEADERS)
+    return StreamingResponse(event_generator(), media_type="text/plain")
+
+
+@router.post("/embed")
+async def embed_documents(
+    modelId: str = Form(...),
+    hfToken: str = Form(...),
+    files: List[UploadFile] = File(...),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Ingests uploaded PDFs into the user's vector store, streaming newline-delimited JSON
+    progress. Uploads are spooled to disk and parsed page by page
+    in a process pool, so memory stays bounded regardless of document size.
+    """
+    req = EmbedRequest(modelId=modelId, hfToken=hfToken, files=[f.filename for f in files])
+    embedder = get_embedding_batcher(req.modelId, req.hfToken)
+
+    async def progress_generator():
+        documents = 0
+        for upload, filename in zip(files, req.files):
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+                await asyncio.to_thread(shutil.copyfileobj, upload.file, tmp)
+                tmp.flush()
+                async with vector_store_lock(current_user["id"]):
+                    vector_db = get_vector_store(current_user["id"], embedder)
+                    try:
+                        async for progress in ingest_pdf(tmp.name, filename, embedder.embed_many, vector_db):
+                            yield json.dumps(progress) + "\n"
+                    except Exception as e:
+                        yield json.dumps({"file": filename, "error": str(e)}) + "\n"
+                    finally:
+                        # Chunks embedded before a failure or disconnect are kept too
+                        await save_vector_store(current_user["id"], vector_db)
+                    documents = len(vector_db)
+        yield json.dumps({"status": "done", "documents": documents}) + "\n"
 
-    return StreamingResponse(event_generator(), media_type="text/plain")
\ No newline at end of file
+    return StreamingResponse(progress_generator(), media_type="application/x-ndjson")
\ No newline at end of file
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable
+
+from database import QueryStats
+
+# Latency per chat pipeline stage across requests, for /metrics/chat
+stage_stats: Dict[str, QueryStats] = {}
+
+
+def stage_metrics() -> dict:
+    return {name: stats.snapshot() for name, stats in stage_stats.items()}
+
+
+class StageGraph:
+    """
+    A small dependency graph of async stages. Every stage starts as soon as the stages
+    it depends on have finished and receives their results as positional arguments, so
+    independent stages overlap. Each stage's start offset and duration are recorded.
+    """
+
+    def __init__(self, name: str = "stages"):
+        self.name = name
+        self.stages: Dict[str, tuple] = {}  # name -> (fn, deps)
+        self.timings: Dict[str, dict] = {}
+
+    def add(self, name: str, fn: Callable[..., Awaitable], deps: Iterable[str] = ()):
+        deps = tuple(deps)
+        missing = [d for d in deps if d not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages {missing}")
+        self.stages[name] = (fn, deps)
+        return self
+
+    async def run(self) -> Dict[str, object]:
+        """Runs all stages; on the first failure the rest are cancelled and the error re-raised."""
+        origin = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str):
+            fn, deps = self.stages[name]
+            args = [await tasks[d] for d in deps]
+            start = time.perf_counter()
+            try:
+                return await fn(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.timings[name] = {
+                    "start_ms": round((start - origin) * 1000, 1),
+                    "duration_ms": round(elapsed * 1000, 1),
+                }
+                stage_stats.setdefault(f"{self.name}.{name}", QueryStats()).observe(elapsed * 1000, False)
+
+        # Stages are added after their dependencies, so creation order is a valid start order
+        for name in self.stages:
+            tasks[name] = asyncio.create_task(run_stage(name))
+        try:
+            done, pending = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+            return {name: task.result() for name, task in tasks.items()}
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Optional
+
+# Flush policy: a frame goes out once SSE_FLUSH_BYTES of text are buffered or the oldest
+# buffered delta is SSE_FLUSH_INTERVAL seconds old, whichever comes first.
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", 256))
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL", 0.05))
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", 15))
+# Per-client bound: upstream reading pauses at SSE_MAX_BUFFER_BYTES unsent, and the
+# upstream stream is cancelled if the client hasn't made room within SSE_SLOW_CLIENT_TIMEOUT.
+SSE_MAX_BUFFER_BYTES = int(os.getenv("SSE_MAX_BUFFER_BYTES", 64 * 1024))
+SSE_SLOW_CLIENT_TIMEOUT = float(os.getenv("SSE_SLOW_CLIENT_TIMEOUT", 30))
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class DeltaCoalescer:
+    """
+    Reads an upstream delta stream in its own task into a bounded text buffer, and
+    hands the response side whole frames on the flush policy. The pump blocks once
+    the buffer is full, so a slow client holds at most `max_buffer_bytes` here, and
+    gives up on upstream entirely if the client stays stalled past `slow_timeout`.
+    """
+
+    def __init__(
+        self,
+        upstream: AsyncIterator[str],
+        flush_bytes: int = SSE_FLUSH_BYTES,
+        flush_interval: float = SSE_FLUSH_INTERVAL,
+        max_buffer_bytes: int = SSE_MAX_BUFFER_BYTES,
+        slow_timeout: float = SSE_SLOW_CLIENT_TIMEOUT,
+    ):
+        self.upstream = upstream
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self.slow_timeout = slow_timeout
+
+        self.buffer = []
+        self.buffered = 0
+        self.first_at = None  # when the oldest unsent delta arrived
+        self.has_data = asyncio.Event()
+        self.drained = asyncio.Event()
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.aborted: Optional[str] = None
+        self.deltas = 0
+        self.chars = 0
+        self.first_delta_at = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        try:
+            async for delta in self.upstream:
+                if not delta:
+                    continue
+                while self.buffered >= self.max_buffer_bytes:
+                    self.drained.clear()
+                    try:
+                        await asyncio.wait_for(self.drained.wait(), self.slow_timeout)
+                    except asyncio.TimeoutError:
+                        self.aborted = "slow_consumer"
+                        return
+                now = time.monotonic()
+                if self.first_at is None:
+                    self.first_at = now
+                if self.first_delta_at is None:
+                    self.first_delta_at = now
+                self.buffer.append(delta)
+                self.buffered += len(delta)
+                self.deltas += 1
+                self.chars += len(delta)
+                self.has_data.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.has_data.set()
+            aclose = getattr(self.upstream, "aclose", None)
+            if aclose:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+
+    def take(self) -> str:
+        frame = "".join(self.buffer)
+        self.buffer.clear()
+        self.buffered = 0
+        self.first_at = None
+        self.has_data.clear()
+        self.drained.set()
+        return frame
+
+    async def frames(self, heartbeat: float = SSE_HEARTBEAT):
+        """Yields text frames, or None when `heartbeat` seconds pass with nothing to send."""
+        while True:
+            if not self.buffer and self.done:
+                return
+            try:
+                await asyncio.wait_for(self.has_data.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            # Hold a small buffer briefly so several deltas share one frame
+            while self.buffer and not self.done and self.buffered < self.flush_bytes:
+                remaining = self.first_at + self.flush_interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.has_data.clear()
+                try:
+                    await asyncio.wait_for(self.has_data.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if self.buffer:
+                yield self.take()
+            else:
+                self.has_data.clear()
+
+    async def close(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+
+async def sse_stream(deltas: AsyncIterator[str], metadata: dict, heartbeat: float = SSE_HEARTBEAT):
+    """
+    Server-Sent Events over a delta stream: coalesced `delta` frames, comment heartbeats,
+    an `error` frame if upstream fails or the client is too slow, and a final `done`
+    frame carrying `metadata` (filled in by the producer as it runs) plus stream stats.
+    """
+    start = time.monotonic()
+    coalescer = DeltaCoalescer(deltas)
+    coalescer.start()
+    frames = 0
+    try:
+        async for frame in coalescer.frames(heartbeat):
+            if frame is None:
+                yield ": ping\n\n"
+                continue
+            frames += 1
+            yield sse_event("delta", {"content": frame})
+
+        if coalescer.error is not None:
+            error = coalescer.error
+            detail = getattr(error, "detail", None) or str(error) or type(error).__name__
+            yield sse_event("error", {"message": detail, "status": getattr(error, "status_code", 500)})
+        elif coalescer.aborted:
+            yield sse_event("error", {"message": "Client too slow; stream cancelled", "reason": coalescer.aborted})
+
+        yield sse_event("done", {
+            **metadata,
+            "finish_reason": "error" if coalescer.error else coalescer.aborted or "stop",
+            "chars": coalescer.chars,
+            "deltas": coalescer.deltas,
+            "frames": frames,
+            "first_delta_ms": round((coalescer.first_delta_at - start) * 1000, 1) if coalescer.first_delta_at else None,
+            "duration_ms": round((time.monotonic() - start) * 1000, 1),
+        })
+    finally:
+        await coalescer.close()
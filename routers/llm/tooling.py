@@ -2,82 +2,608 @@
 #from langchain.embeddings.openai import OpenAIEmbeddings
 #from langchain.chat_models import ChatOpenAI
 #from langchain.chains import RetrievalQA
-from search import get_top_paragraphs, should_search
-from typing import List
+from search import SEARCH_DEADLINE, SEARCH_TRIGGERS, get_top_paragraphs
+from typing import List, Dict, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, deque
+import asyncio
+import hashlib
+import numpy as np
+import json
+import os
+import re
+import shutil
+import time
+from .ann_index import IVFIndex
+from cache import TTLCache
 #from langchain.embeddings import OpenAIEmbeddings
 #from langchain.text_splitter import RecursiveCharacterTextSplitter
 import PyPDF2
 
 
 class VectorDB:
-    def __init__(self, embedding_model):
+    """
+    In-memory embedding store backed by a contiguous float32 matrix of L2-normalized
+    rows, so cosine similarity for a batch of queries is a single matrix product.
+    Documents get compact integer ids; deletes leave tombstones that are repacked
+    away once they pass `repack_ratio` of the rows. An optional ANN `index`
+    (see ann_index.py) narrows each query to candidate rows once it is trained.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        dim: int = None,
+        initial_capacity: int = 1024,
+        repack_ratio: float = 0.25,
+        index=None,
+    ):
         self.embedding_model = embedding_model
-        self.index = {}
+        self.index = index
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self.repack_ratio = repack_ratio
+        self.vectors = None                     # (capacity, dim) float32, rows [0, count) in use
+        self.row_ids = np.empty(0, np.int64)    # row -> doc id
+        self.alive = np.zeros(0, bool)          # row -> not tombstoned
+        self.count = 0
+        self.deleted = 0
+        self.rows: Dict[int, int] = {}          # doc id -> row
+        self.texts: Dict[int, str] = {}
+        self.metadata: Dict[int, Any] = {}
+        self.next_id = 0
+
+    def __len__(self):
+        return self.count - self.deleted
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _reserve(self, extra: int):
+        needed = self.count + extra
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(self.initial_capacity, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        vectors = np.empty((new_capacity, self.dim), np.float32)
+        row_ids = np.empty(new_capacity, np.int64)
+        alive = np.zeros(new_capacity, bool)
+        if self.count:
+            vectors[:self.count] = self.vectors[:self.count]
+            row_ids[:self.count] = self.row_ids[:self.count]
+            alive[:self.count] = self.alive[:self.count]
+        self.vectors, self.row_ids, self.alive = vectors, row_ids, alive
+
+    def add(self, embeddings, texts: List[str], metadatas: List[Any] = None) -> List[int]:
+        """Adds a batch of precomputed embeddings; returns their document ids."""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        if len(matrix) != len(texts):
+            raise ValueError("embeddings and texts must have the same length")
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-dimensional embeddings, got {matrix.shape[1]}")
+
+        n = len(matrix)
+        self._reserve(n)
+        start = self.count
+        doc_ids = list(range(self.next_id, self.next_id + n))
+        self.vectors[start:start + n] = self._normalize(matrix)
+        self.row_ids[start:start + n] = doc_ids
+        self.alive[start:start + n] = True
+        for i, doc_id in enumerate(doc_ids):
+            self.rows[doc_id] = start + i
+            self.texts[doc_id] = texts[i]
+            self.metadata[doc_id] = metadatas[i] if metadatas else None
+        self.count += n
+        self.next_id += n
+        if self.index is not None:
+            self.index.add(np.arange(start, start + n), self.vectors[start:start + n])
+        return doc_ids
+
+    async def add_document(self, text, metadata=None) -> int:
+        embedding = await self.embedding_model.embed(text)
+        return self.add([embedding], [text], [metadata])[0]
+
+    def delete(self, doc_ids: List[int]):
+        for doc_id in doc_ids:
+            row = self.rows.pop(doc_id, None)
+            if row is None:
+                continue
+            self.alive[row] = False
+            self.texts.pop(doc_id, None)
+            self.metadata.pop(doc_id, None)
+            self.deleted += 1
+        if self.count and self.deleted / self.count > self.repack_ratio:
+            self.repack()
+
+    def repack(self):
+        """Drops tombstoned rows, keeping the matrix contiguous."""
+        keep = np.flatnonzero(self.alive[:self.count])
+        n = len(keep)
+        self.vectors[:n] = self.vectors[keep]
+        self.row_ids[:n] = self.row_ids[keep]
+        self.alive[:n] = True
+        self.alive[n:self.count] = False
+        self.count, self.deleted = n, 0
+        self.rows = {int(doc_id): row for row, doc_id in enumerate(self.row_ids[:n])}
+        if self.index is not None:
+            self.index.rebuild(self.vectors[:n])
+
+    def search(self, query_embeddings, top_k: int = 3) -> List[List[Tuple[int, float]]]:
+        """Cosine top-k for a batch of query embeddings, as (doc id, score) lists."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        k = min(top_k, len(self))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        queries = self._normalize(queries)
+        if self.index is not None and self.index.ready:
+            return [self._search_candidates(q, self.index.candidates(q), k) for q in queries]
+
+        scores = queries @ self.vectors[:self.count].T
+        if self.deleted:
+            scores[:, ~self.alive[:self.count]] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(int(self.row_ids[row]), float(score)) for row, score in zip(rows, row_scores)]
+            for rows, row_scores in zip(top, top_scores)
+        ]
+
+    def _search_candidates(self, query: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        rows = rows[self.alive[rows]]
+        if not len(rows):
+            return []
+        k = min(k, len(rows))
+        scores = self.vectors[rows] @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.row_ids[rows[i]]), float(scores[i])) for i in top]
+
+    def save(self, directory: str):
+        """Writes the matrix and index as .npy files that `load` can memory-map."""
+        os.makedirs(directory, exist_ok=True)
+        if self.count:
+            np.save(os.path.join(directory, "vectors.npy"), self.vectors[:self.count])
+        np.save(os.path.join(directory, "row_ids.npy"), self.row_ids[:self.count])
+        np.save(os.path.join(directory, "alive.npy"), self.alive[:self.count])
+        with open(os.path.join(directory, "documents.json"), "w") as f:
+            json.dump({
+                "dim": self.dim,
+                "next_id": self.next_id,
+                "texts": {str(k): v for k, v in self.texts.items()},
+                "metadata": {str(k): v for k, v in self.metadata.items()},
+            }, f)
+        if self.index is not None:
+            self.index.save(directory)
+
+    @classmethod
+    def load(cls, directory: str, embedding_model, mmap: bool = True, **kwargs) -> "VectorDB":
+        with open(os.path.join(directory, "documents.json")) as f:
+            documents = json.load(f)
+        if os.path.exists(os.path.join(directory, "ivf.json")):
+            kwargs.setdefault("index", IVFIndex.load(directory, mmap=mmap))
+        db = cls(embedding_model, dim=documents["dim"], **kwargs)
+        db.row_ids = np.load(os.path.join(directory, "row_ids.npy"))
+        db.alive = np.load(os.path.join(directory, "alive.npy"))
+        db.count = len(db.row_ids)
+        if db.count:
+            # Copy-on-write: pages are shared with the file until a row is modified
+            db.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="c" if mmap else None)
+        db.deleted = int(db.count - db.alive.sum())
+        db.next_id = documents["next_id"]
+        db.texts = {int(k): v for k, v in documents["texts"].items()}
+        db.metadata = {int(k): v for k, v in documents["metadata"].items()}
+        db.rows = {int(doc_id): row for row, doc_id in enumerate(db.row_ids) if db.alive[row]}
+        if db.index is not None and not db.index.ready and db.count:
+            # An untrained index only holds rows in memory; re-register them so they
+            # are bucketed once enough rows arrive to train
+            db.index.rebuild(db.vectors[:db.count])
+        return db
+
+    async def query(self, query_text, top_k=3) -> List[Tuple[str, float]]:
+        query_embedding = await self.embedding_model.embed(query_text)
+        return [(self.texts[doc_id], score) for doc_id, score in self.search(query_embedding, top_k)[0]]
+
+class EmbeddingBatcher:
+    """
+    Coalesces embed() calls from concurrent requests into one `embed_many` call per
+    batch: a batch goes out once `max_batch` texts are queued or `max_delay` seconds
+    after its first text. Identical texts, queued or in flight, share one result,
+    and recent results are kept in a content-hash cache.
+    """
+
+    def __init__(self, model, max_batch: int = 64, max_delay: float = 0.005, cache_size: int = 4096):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.cache = TTLCache("embeddings", max_entries=cache_size, ttl=60 * 60)
+        self.in_flight: Dict[str, asyncio.Future] = {}  # content hash -> result
+        self.queue: List[Tuple[str, str]] = []
+        self.timer = None
+        self.sending: set = set()  # strong refs, so the loop can't collect a batch mid-flight
+        self.batches = 0
+        self.texts = 0
+        self.coalesced = 0
+
+    async def embed(self, text: str):
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+            self.queue.append((key, text))
+            if len(self.queue) >= self.max_batch:
+                self._flush()
+            elif self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        else:
+            self.coalesced += 1
+        # Shielded so one caller going away doesn't fail everyone waiting on the same text
+        return await asyncio.shield(future)
 
-    def add_document(self, text, metadata=None):
-        embedding = self.embedding_model.embed(text)
-        self.index[text] = {"embedding": embedding, "metadata": metadata}
+    async def embed_many(self, texts: List[str]):
+        return await asyncio.gather(*(self.embed(t) for t in texts))
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.queue = self.queue, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self.sending.add(task)
+            task.add_done_callback(self.sending.discard)
+
+    async def _send(self, batch: List[Tuple[str, str]]):
+        self.batches += 1
+        self.texts += len(batch)
+        error = None
+        try:
+            embeddings = await self.model.embed_many([text for _, text in batch])
+            if len(embeddings) != len(batch):
+                raise ValueError(f"embedding provider returned {len(embeddings)} vectors for {len(batch)} texts")
+            for (key, _), embedding in zip(batch, embeddings):
+                self.cache.set(key, embedding)
+                future = self.in_flight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_result(embedding)
+        except Exception as e:
+            error = e
+        finally:
+            # Whatever didn't get a result must not stay in flight, or later calls for
+            # the same text would wait on it forever
+            for key, _ in batch:
+                future = self.in_flight.pop(key, None)
+                if future is not None and not future.done():
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch": self.texts / self.batches if self.batches else 0.0,
+            "coalesced": self.coalesced,
+            "cache": self.cache.stats(),
+        }
 
-    def query(self, query_text, top_k=3):
-        query_embedding = self.embedding_model.embed(query_text)
-        return self._nearest_neighbors(query_embedding, top_k)
 
 class RAGPipeline:
     def __init__(self, vector_db, llm):
         self.vector_db = vector_db
         self.llm = llm
 
-    def answer_query(self, query):
-        relevant_docs = self.vector_db.query(query)
+    async def answer_query(self, query):
+        relevant_docs = await self.vector_db.query(query)
         context = "\n".join([doc for doc, _ in relevant_docs])
         prompt = f"Context: {context}\n\nQuestion: {query}\nAnswer:"
         response = self.llm.generate(prompt)
         return response
     
 
+TOOL_DEADLINE = float(os.getenv("TOOL_DEADLINE", 8))  # default per-tool budget, seconds
+
+
 class LLMTool:
     name = None
-    trigger = None  # function that returns bool
+    triggers: Tuple[str, ...] = ()  # case-insensitive phrases, matched in one pass by ToolRegistry
+    trigger = None  # optional function returning bool, for conditions phrases can't express
+    deadline = TOOL_DEADLINE
 
     async def run(self, user_input: str):
         raise NotImplementedError
-    
+
+
 class SearchTool(LLMTool):
     name = "search"
-    trigger = staticmethod(should_search)
+    triggers = SEARCH_TRIGGERS
+    # get_top_paragraphs returns partial results at SEARCH_DEADLINE; leave it room to do so
+    deadline = SEARCH_DEADLINE + 1
 
     async def run(self, user_input: str):
-        paragraphs = get_top_paragraphs(user_input)
+        paragraphs = await get_top_paragraphs(user_input)
         if isinstance(paragraphs, list):
             return "\n\n".join(paragraphs)
         return paragraphs
 
-class LLMTooling:
+
+class ToolRegistry:
+    """
+    Process-wide tool instances and a single compiled pattern over every tool's trigger
+    phrases. Subclasses of LLMTool are picked up on first use (and again if more are
+    defined later); matching tools run concurrently, each under its own deadline.
+    """
+
     def __init__(self):
-        # automatically find subclasses of LLMTool
-        self.tools = {t.name: t() for t in LLMTool.__subclasses__()}
+        self.tools: Dict[str, LLMTool] = {}
+        self.phrase_tools: Dict[str, List[str]] = {}
+        self.phrase_tool_count = 0
+        self.pattern = None
+        self.timeouts = 0
+        self.failures = 0
 
-    async def handle_input(self, user_input: str):
+    def _refresh(self):
+        classes = [t for t in LLMTool.__subclasses__() if t.name]
+        if len(classes) == len(self.tools):
+            return
+        self.tools = {t.name: t() for t in classes}
+        self.phrase_tools = {}
         for tool in self.tools.values():
-            if tool.trigger and tool.trigger(user_input):
-                return await tool.run(user_input)
+            for phrase in tool.triggers:
+                self.phrase_tools.setdefault(phrase.lower(), []).append(tool.name)
+        self.phrase_tool_count = sum(1 for tool in self.tools.values() if tool.triggers)
+        # Longest first, so a phrase that contains another one wins at the same position
+        phrases = sorted(self.phrase_tools, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(p) for p in phrases), re.IGNORECASE) if phrases else None
+
+    def match(self, user_input: str) -> List[LLMTool]:
+        self._refresh()
+        names = set()
+        if self.pattern is not None:
+            for m in self.pattern.finditer(user_input):
+                names.update(self.phrase_tools[m.group(0).lower()])
+                if len(names) == self.phrase_tool_count:
+                    break
+        for tool in self.tools.values():
+            if tool.name not in names and tool.trigger and tool.trigger(user_input):
+                names.add(tool.name)
+        return [tool for name, tool in self.tools.items() if name in names]
+
+    async def _run(self, tool: LLMTool, user_input: str):
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(tool.run(user_input), tool.deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            print(f"[tools] {tool.name} missed its {tool.deadline:.1f}s deadline")
+        except Exception as e:
+            self.failures += 1
+            print(f"[tools] {tool.name} failed after {time.perf_counter() - start:.2f}s: {e}")
         return None
-    
 
+    async def run(self, user_input: str):
+        """Runs every matching tool at once and merges the results that arrived in time."""
+        tools = self.match(user_input)
+        if not tools:
+            return None
+        results = await asyncio.gather(*(self._run(tool, user_input) for tool in tools))
+        context = [r for r in results if r]
+        return "\n\n".join(context) if context else None
+
+
+tool_registry = ToolRegistry()
+
+
+class LLMTooling:
+    def __init__(self, registry: ToolRegistry = tool_registry):
+        self.registry = registry
+
+    async def handle_input(self, user_input: str):
+        return await self.registry.run(user_input)
+
+
+
+# --------------------- Document ingestion ---------------------- #
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 2))
+PDF_PAGE_BATCH = int(os.getenv("PDF_PAGE_BATCH", 8))
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", 32))
+
+# Each user's store is saved under VECTOR_STORE_DIR/<user_id>/<generation>/, with
+# CURRENT naming the live generation, so every worker sees the latest ingest and a
+# save never rewrites files another process has memory-mapped.
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_stores")
+MAX_VECTOR_STORES = int(os.getenv("MAX_VECTOR_STORES", 64))
+
+_pdf_pool: ProcessPoolExecutor = None
+vector_stores: "OrderedDict[str, Tuple[VectorDB, str]]" = OrderedDict()  # user -> (store, generation)
+vector_store_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _current_generation(user_dir: str) -> str:
+    try:
+        with open(os.path.join(user_dir, "CURRENT")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def get_vector_store(user_id: str, embedding_model) -> VectorDB:
+    """
+    The user's store, reloaded from disk if another worker saved a newer generation.
+    At most MAX_VECTOR_STORES stay open; the least recently used idle one is dropped
+    (it is already on disk) when the bound is passed.
+    """
+    key = str(user_id)
+    user_dir = os.path.join(VECTOR_STORE_DIR, key)
+    generation = _current_generation(user_dir)
+    cached = vector_stores.get(key)
+    if cached is not None and cached[1] == generation:
+        vector_db = cached[0]
+        vector_db.embedding_model = embedding_model
+        vector_stores.move_to_end(key)
+        return vector_db
+    if generation:
+        vector_db = VectorDB.load(os.path.join(user_dir, generation), embedding_model)
+    else:
+        vector_db = VectorDB(embedding_model, index=IVFIndex())
+    vector_stores[key] = (vector_db, generation)
+    vector_stores.move_to_end(key)
+    for idle in [k for k in vector_stores if k != key][:max(0, len(vector_stores) - MAX_VECTOR_STORES)]:
+        lock = vector_store_locks.get(idle)
+        if lock is None or not lock.locked():
+            del vector_stores[idle]
+            vector_store_locks.pop(idle, None)
+    return vector_db
+
+
+def vector_store_lock(user_id: str) -> asyncio.Lock:
+    """Held across an ingest and its save, so a store is never written while it is being saved."""
+    return vector_store_locks.setdefault(str(user_id), asyncio.Lock())
+
+
+def _save_generation(vector_db: VectorDB, user_dir: str) -> str:
+    generation = f"{time.time_ns():x}-{os.getpid()}"
+    vector_db.save(os.path.join(user_dir, generation))
+    previous = _current_generation(user_dir)
+    pointer = os.path.join(user_dir, f"CURRENT.{generation}")
+    with open(pointer, "w") as f:
+        f.write(generation)
+    os.replace(pointer, os.path.join(user_dir, "CURRENT"))
+    if previous:
+        # Processes that mapped the old files keep reading them until they reload
+        shutil.rmtree(os.path.join(user_dir, previous), ignore_errors=True)
+    return generation
+
+
+async def save_vector_store(user_id: str, vector_db: VectorDB):
+    """Writes the store as a new generation off the event loop; call under vector_store_lock."""
+    key = str(user_id)
+    generation = await asyncio.to_thread(_save_generation, vector_db, os.path.join(VECTOR_STORE_DIR, key))
+    if key in vector_stores and vector_stores[key][0] is vector_db:
+        vector_stores[key] = (vector_db, generation)
+
+
+def _pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(cancel_futures=True)
+        _pdf_pool = None
+
+
+def pdf_page_count(path: str) -> int:
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    # Runs in a worker process; each call opens the file itself
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+async def iter_pdf_pages(path: str, page_count: int, batch: int = PDF_PAGE_BATCH):
+    """Yields page texts in order, keeping at most one batch per worker in flight."""
+    loop = asyncio.get_running_loop()
+    executor = _pdf_executor()
+    starts = iter(range(0, page_count, batch))
+    in_flight = deque()
+
+    def submit():
+        start = next(starts, None)
+        if start is not None:
+            in_flight.append(loop.run_in_executor(
+                executor, extract_pdf_pages, path, start, min(start + batch, page_count)
+            ))
+
+    for _ in range(PDF_WORKERS + 1):
+        submit()
+    while in_flight:
+        pages = await in_flight.popleft()
+        submit()
+        for text in pages:
+            yield text
+
+
+class TextChunker:
+    """Streaming fixed-size chunker with overlap; only the unfinished tail is buffered."""
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        chunks = []
+        step = self.chunk_size - self.chunk_overlap
+        while len(self.buffer) >= self.chunk_size:
+            chunks.append(self.buffer[:self.chunk_size])
+            self.buffer = self.buffer[step:]
+        return chunks
+
+    def flush(self) -> List[str]:
+        chunks = [self.buffer] if self.buffer.strip() else []
+        self.buffer = ""
+        return chunks
+
+
+async def ingest_pdf(path: str, filename: str, embed_many, vector_db: VectorDB):
+    """
+    Parses `path` in the PDF process pool, chunks pages as they arrive and embeds
+    chunks in batches of EMBED_BATCH. Yields a progress dict after each batch.
+    """
+    page_count = await asyncio.get_running_loop().run_in_executor(_pdf_executor(), pdf_page_count, path)
+    chunker = TextChunker()
+    batch: List[str] = []
+    pages_done = chunks_done = 0
+
+    def progress():
+        return {"file": filename, "pages_done": pages_done, "pages_total": page_count, "chunks_embedded": chunks_done}
 
-#embeddings_model = OpenAIEmbeddings()
+    async def embed(chunks: List[str]):
+        nonlocal chunks_done
+        embeddings = await embed_many(chunks)
+        vector_db.add(embeddings, chunks, [{"source": filename}] * len(chunks))
+        chunks_done += len(chunks)
 
-#def read_pdf(file):
-#    reader = PyPDF2.PdfReader(file)
-#    text = ""
-#    for page in reader.pages:
-#        text += page.extract_text() + "\n"
-#    return text
+    async for text in iter_pdf_pages(path, page_count):
+        pages_done += 1
+        batch.extend(chunker.feed(text + "\n"))
+        while len(batch) >= EMBED_BATCH:
+            await embed(batch[:EMBED_BATCH])
+            batch = batch[EMBED_BATCH:]
+            yield progress()
+        if pages_done % PDF_PAGE_BATCH == 0:
+            yield progress()
 
-#def chunk_and_embed(text, chunk_size=500, chunk_overlap=50):
-#    splitter = RecursiveCharacterTextSplitter(
-#        chunk_size=chunk_size,
-#        chunk_overlap=chunk_overlap
-#    )
-#    chunks = splitter.split_text(text)
-#    return [(chunk, embeddings_model.embed(chunk)) for chunk in chunks]
+    batch.extend(chunker.flush())
+    if batch:
+        await embed(batch)
+    yield progress()
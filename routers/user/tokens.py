@@ -1,39 +1,56 @@
 from fastapi import APIRouter, HTTPException, Depends, Cookie
-from database import database
-from routers.auth.auth_utils import get_current_user
-from schemas import HFTokenRequest
+from database import db
+from routers.auth.auth_utils import get_current_user, invalidate_user
+from schemas import HFTokenRequest, HFTokenBulkRequest
 import json
 
 router = APIRouter()
 
 
+def _token_list(value) -> list:
+    # asyncpg hands jsonb back as text
+    if isinstance(value, str):
+        return json.loads(value)
+    return value or []
+
+
 @router.post("/hf_token")
 async def add_hf_token(req: HFTokenRequest, current_user: dict = Depends(get_current_user)):
-    query = "SELECT hf_tokens FROM users WHERE id = :user_id"
-    db_user = await database.fetch_one(query=query, values={"user_id": current_user["id"]})
-    current_tokens = json.loads(db_user["hf_tokens"]) if db_user["hf_tokens"] else []
-
-    if req.hf_token in current_tokens:
+    row = await db.fetch_one("hf_tokens.add", {"token": req.hf_token, "user_id": current_user["id"]})
+    if not row:
         raise HTTPException(status_code=400, detail="Token already exists")
+    invalidate_user(current_user["id"])
 
-    current_tokens.append(req.hf_token)
-    update_query = "UPDATE users SET hf_tokens = :hf_tokens WHERE id = :user_id"
-    await database.execute(query=update_query, values={"hf_tokens": json.dumps(current_tokens), "user_id": current_user["id"]})
-
-    return {"message": "HF Token added successfully", "hf_tokens": current_tokens}
+    return {"message": "HF Token added successfully", "hf_tokens": _token_list(row["hf_tokens"])}
 
 
 @router.delete("/hf_token")
 async def remove_hf_token(req: HFTokenRequest, current_user: dict = Depends(get_current_user)):
-    query = "SELECT hf_tokens FROM users WHERE id = :user_id"
-    db_user = await database.fetch_one(query=query, values={"user_id": current_user["id"]})
-    current_tokens = json.loads(db_user["hf_tokens"]) if db_user["hf_tokens"] else []
-
-    if req.hf_token not in current_tokens:
+    row = await db.fetch_one("hf_tokens.remove", {"token": req.hf_token, "user_id": current_user["id"]})
+    if not row:
         raise HTTPException(status_code=404, detail="Token not found")
+    invalidate_user(current_user["id"])
+
+    return {"message": "HF Token deleted successfully", "hf_tokens": _token_list(row["hf_tokens"])}
+
+
+@router.post("/hf_tokens")
+async def add_hf_tokens(req: HFTokenBulkRequest, current_user: dict = Depends(get_current_user)):
+    # Tokens already stored are skipped rather than rejected
+    new_tokens = list(dict.fromkeys(req.hf_tokens))
+    row = await db.fetch_one("hf_tokens.add_many", {"tokens": new_tokens, "user_id": current_user["id"]})
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(current_user["id"])
+
+    return {"message": "HF Tokens added successfully", "hf_tokens": _token_list(row["hf_tokens"])}
+
 
-    current_tokens.remove(req.hf_token)
-    update_query = "UPDATE users SET hf_tokens = :hf_tokens WHERE id = :user_id"
-    await database.execute(query=update_query, values={"hf_tokens": json.dumps(current_tokens), "user_id": current_user["id"]})
+@router.delete("/hf_tokens")
+async def remove_hf_tokens(req: HFTokenBulkRequest, current_user: dict = Depends(get_current_user)):
+    row = await db.fetch_one("hf_tokens.remove_many", {"tokens": list(req.hf_tokens), "user_id": current_user["id"]})
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(current_user["id"])
 
-    return {"message": "HF Token deleted successfully", "hf_tokens": current_tokens}
\ No newline at end of file
+    return {"message": "HF Tokens deleted successfully", "hf_tokens": _token_list(row["hf_tokens"])}
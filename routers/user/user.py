@@ -1,70 +1,72 @@
 from fastapi import APIRouter, Depends
-from database import database
-from routers.auth.auth_utils import get_current_user
-from schemas import FavLLM
-from uuid import uuid4
+from database import db
+from cache import TTLCache
+from routers.auth.auth_utils import get_current_user, invalidate_user
+from schemas import FavLLM, FavLLMBulk
+import os
 
 router = APIRouter()
 
+# Hugging Face model name -> llms.id. Ids never change once a model row exists,
+# so a hit lets add/remove skip the llms upsert and touch only users.favorites.
+llm_id_cache = TTLCache("llm_ids", max_entries=4096, ttl=float(os.getenv("LLM_ID_CACHE_TTL", 3600)))
+
+
 @router.post("/add_fav")
 async def add_fav(req: FavLLM, current_user: dict = Depends(get_current_user)):
-    # 1️⃣ Check if the LLM already exists in the database
-    query_check = "SELECT id FROM llms WHERE name = :hf_id"
-    llm = await database.fetch_one(query=query_check, values={"hf_id": req.hf_id})
-
-    # 2️⃣ If not, insert it with a UUID as primary key
-    if not llm:
-        llm_uuid = str(uuid4())
-        query_insert = """
-        INSERT INTO llms (id, name)
-        VALUES (:llm_id, :name)
-        """
-        await database.execute(query=query_insert, values={
-            "llm_id": llm_uuid,  # real UUID
-            "name": req.hf_id     # store Hugging Face ID here
-        })
-        llm_id_to_use = llm_uuid
+    llm_id = llm_id_cache.get(req.hf_id)
+    if llm_id is not None:
+        await db.execute("users.add_favorite", {"llm_id": llm_id, "user_id": current_user["id"]})
     else:
-        llm_id_to_use = llm["id"]
-
-    # 3️⃣ Add the LLM UUID to the user's favorites if not already present
-    query_update = """
-    UPDATE users
-    SET favorites = array_append(favorites, :llm_id)
-    WHERE id = :user_id
-      AND NOT (:llm_id = ANY(favorites))
-    """
-    await database.execute(query=query_update, values={
-        "llm_id": llm_id_to_use,
-        "user_id": current_user["id"]
-    })
+        # Creates the llms row if needed and appends it to favorites in one statement
+        row = await db.fetch_one("favorites.add_by_name", {"name": req.hf_id, "user_id": current_user["id"]})
+        llm_id_cache.set(req.hf_id, row["llm_id"])
+    invalidate_user(current_user["id"])
 
     return {"status": "success", "message": "Favourite added"}
 
 
-
-
 @router.post("/remove_fav")
 async def remove_fav(req: FavLLM, current_user: dict = Depends(get_current_user)):
-    # 1️⃣ Look up the LLM in the database
-    query_check = "SELECT id FROM llms WHERE name = :hf_id"
-    llm = await database.fetch_one(query=query_check, values={"hf_id": req.hf_id})
+    llm_id = llm_id_cache.get(req.hf_id)
+    if llm_id is not None:
+        await db.execute("users.remove_favorite", {"llm_id": llm_id, "user_id": current_user["id"]})
+    else:
+        row = await db.fetch_one("favorites.remove_by_name", {"name": req.hf_id, "user_id": current_user["id"]})
+        if not row:
+            return {"status": "error", "message": "LLM not found"}
+        llm_id_cache.set(req.hf_id, row["llm_id"])
+    invalidate_user(current_user["id"])
+
+    return {"status": "success", "message": "Favourite removed"}
+
+
+@router.post("/add_favs")
+async def add_favs(req: FavLLMBulk, current_user: dict = Depends(get_current_user)):
+    names = list(dict.fromkeys(req.hf_ids))  # an upsert can't touch the same row twice
+    if names:
+        rows = await db.fetch_all("favorites.add_many", {"names": names, "user_id": current_user["id"]})
+        for row in rows:
+            llm_id_cache.set(row["name"], row["llm_id"])
+        invalidate_user(current_user["id"])
 
-    if not llm:
-        return {"status": "error", "message": "LLM not found"}
+    return {"status": "success", "message": "Favourites added", "added": names}
 
-    llm_id_to_remove = llm["id"]
 
-    # 2️⃣ Remove the LLM UUID from the user's favorites
-    query_update = """
-    UPDATE users
-    SET favorites = array_remove(favorites, :llm_id)
-    WHERE id = :user_id
-      AND :llm_id = ANY(favorites)
-    """
-    await database.execute(query=query_update, values={
-        "llm_id": llm_id_to_remove,
-        "user_id": current_user["id"]
-    })
+@router.post("/remove_favs")
+async def remove_favs(req: FavLLMBulk, current_user: dict = Depends(get_current_user)):
+    names = list(dict.fromkeys(req.hf_ids))
+    found = set()
+    if names:
+        rows = await db.fetch_all("favorites.remove_many", {"names": names, "user_id": current_user["id"]})
+        for row in rows:
+            llm_id_cache.set(row["name"], row["llm_id"])
+            found.add(row["name"])
+        invalidate_user(current_user["id"])
 
-    return {"status": "success", "message": "Favourite removed"}
\ No newline at end of file
+    return {
+        "status": "success",
+        "message": "Favourites removed",
+        "removed": [name for name in names if name in found],
+        "not_found": [name for name in names if name not in found],
+    }
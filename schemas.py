@@ -15,6 +15,9 @@ class UserLogin(BaseModel):
 class HFTokenRequest(BaseModel):
     hf_token: str
 
+class HFTokenBulkRequest(BaseModel):
+    hf_tokens: List[str]
+
 class UserOut(BaseModel):
     id: str
     username: str
@@ -27,6 +30,9 @@ class UserOut(BaseModel):
 class FavLLM(BaseModel):
     hf_id: str
 
+class FavLLMBulk(BaseModel):
+    hf_ids: List[str]
+
 class AddLLMRequest(BaseModel):
     llm_id: str
     llm_name: str
@@ -41,6 +47,7 @@ class StoredMessage(BaseModel):
     role: str
     created_at: datetime
     metadata: Dict[str, Any] = {}
+    token_count: int = 0  # estimated at append time; 0 for messages stored before counts existed
 
     class Config:
         orm_mode = True
@@ -1,18 +1,96 @@
-import requests
+import asyncio
+import codecs
+import contextlib
+import os
+import re
+import httpx
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
 import urllib.parse
+from typing import Dict
+from cache import TTLCache, DiskCache
 
-def should_search(user_input: str) -> bool:
-    triggers = ["search", "look up", "find info", "google", "can you check online", "what does the internet say"]
-    text = user_input.lower()
-    return any(trigger in text for trigger in triggers)
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+PAGE_TIMEOUT = 10
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", 6))  # seconds for search + all page fetches
+PER_HOST_LIMIT = int(os.getenv("SEARCH_PER_HOST_LIMIT", 2))
+MAX_PAGE_BYTES = int(os.getenv("SEARCH_MAX_PAGE_BYTES", 1024 * 1024))  # stop reading a page past this
 
-def duckduckgo_search(query, num_results=3):
-    encoded_query = urllib.parse.quote_plus(query)
-    url = f"https://duckduckgo.com/html/?q={encoded_query}"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
+# query -> result URLs and URL -> paragraphs are cached separately; failing URLs are
+# remembered briefly so they aren't retried on every chat. SEARCH_CACHE_PATH adds a
+# SQLite store behind the in-memory LRUs that survives restarts.
+RESULTS_TTL = float(os.getenv("SEARCH_RESULTS_TTL", 60 * 60))
+PAGES_TTL = float(os.getenv("SEARCH_PAGES_TTL", 24 * 60 * 60))
+FAILED_TTL = float(os.getenv("SEARCH_FAILED_TTL", 10 * 60))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH")
+
+results_cache = TTLCache("search_results", max_entries=2048, ttl=RESULTS_TTL)
+pages_cache = TTLCache("search_pages", max_entries=4096, ttl=PAGES_TTL)
+failed_urls = TTLCache("search_failed_urls", max_entries=4096, ttl=FAILED_TTL)
+disk_cache = DiskCache(SEARCH_CACHE_PATH, name="search_disk") if SEARCH_CACHE_PATH else None
+
+_client: httpx.AsyncClient = None
+_host_limits: Dict[str, list] = {}  # host -> [semaphore, fetches using or waiting on it]
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers=HEADERS,
+            follow_redirects=True,
+            timeout=PAGE_TIMEOUT,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _cache_get(cache: TTLCache, key: str):
+    value = cache.get(key)
+    if value is not None or disk_cache is None:
+        return value
+    found = await asyncio.to_thread(disk_cache.get, key)
+    if found is None:
+        return None
+    value, remaining = found
+    cache.set(key, value, ttl=remaining)
+    return value
+
+async def _cache_set(cache: TTLCache, key: str, value, ttl: float):
+    cache.set(key, value, ttl=ttl)
+    if disk_cache is not None:
+        await asyncio.to_thread(disk_cache.set, key, value, ttl)
+
+def cache_stats() -> dict:
+    stats = {c.name: c.stats() for c in (results_cache, pages_cache, failed_urls)}
+    if disk_cache is not None:
+        stats[disk_cache.name] = disk_cache.stats()
+    return stats
+
+@contextlib.asynccontextmanager
+async def _host_limit(url: str):
+    """Holds one of the host's PER_HOST_LIMIT slots; a host's entry is dropped once no fetch uses it."""
+    host = urllib.parse.urlparse(url).netloc
+    entry = _host_limits.get(host)
+    if entry is None:
+        entry = _host_limits[host] = [asyncio.Semaphore(PER_HOST_LIMIT), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _host_limits[host]
+
+SEARCH_TRIGGERS = ("search", "look up", "find info", "google", "can you check online", "what does the internet say")
+
+def parse_search_results(html: str, num_results=3):
+    soup = BeautifulSoup(html, "html.parser")
 
     results = []
     for link in soup.find_all("a", class_="result__a", limit=num_results):
@@ -25,31 +103,158 @@ def duckduckgo_search(query, num_results=3):
         results.append({"title": title, "url": real_url})
     return results
 
-def fetch_page_paragraphs(url, max_paragraphs=7):
+async def duckduckgo_search(query, num_results=3):
+    key = f"q:{num_results}:{' '.join(query.lower().split())}"
+    cached = await _cache_get(results_cache, key)
+    if cached is not None:
+        return cached
+
+    encoded_query = urllib.parse.quote_plus(query)
+    url = f"https://duckduckgo.com/html/?q={encoded_query}"
+    response = await get_client().get(url)
+    results = await asyncio.to_thread(parse_search_results, response.text, num_results)
+    if results:
+        await _cache_set(results_cache, key, results, RESULTS_TTL)
+    return results
+
+class ParagraphExtractor(HTMLParser):
+    """
+    Incremental <p> text extractor. Feed it HTML as it arrives and stop once
+    `done` is set; script/style content is skipped.
+    """
+
+    SKIP_TAGS = {"script", "style", "noscript", "template"}
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, max_paragraphs=7, sink=None):
+        super().__init__(convert_charrefs=True)
+        self.max_paragraphs = max_paragraphs
+        self.paragraphs = sink if sink is not None else []
+        self.skip_depth = 0
+        self.in_paragraph = False
+        self.buffer = []
+
+    @property
+    def done(self) -> bool:
+        return len(self.paragraphs) >= self.max_paragraphs
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == "p":
+            self._close_paragraph()
+            self.in_paragraph = True
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag == "p":
+            self._close_paragraph()
+
+    def handle_data(self, data):
+        if self.in_paragraph and not self.skip_depth:
+            self.buffer.append(data)
+
+    def _close_paragraph(self):
+        if self.in_paragraph and not self.done:
+            text = self._WHITESPACE.sub(" ", "".join(self.buffer)).strip()
+            if text:
+                self.paragraphs.append(text)
+        self.in_paragraph = False
+        self.buffer = []
+
+    def close(self):
+        super().close()
+        self._close_paragraph()
+
+
+def extract_paragraphs(html: str, max_paragraphs=7):
+    extractor = ParagraphExtractor(max_paragraphs)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.paragraphs
+
+async def _stream_paragraphs(url: str, max_paragraphs: int, sink: list):
+    extractor = ParagraphExtractor(max_paragraphs, sink)
+    async with get_client().stream("GET", url) as res:
+        res.raise_for_status()
+        decoder = codecs.getincrementaldecoder(res.encoding or "utf-8")(errors="replace")
+        received = 0
+        async for chunk in res.aiter_bytes():
+            received += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+            if extractor.done or received >= MAX_PAGE_BYTES:
+                break
+    extractor.close()
+    return extractor.paragraphs
+
+async def fetch_page_paragraphs(url, max_paragraphs=7, sink=None):
+    """
+    Streams `url` and returns its first paragraphs. Paragraphs are also appended
+    to `sink` as they are parsed, so a caller can keep them if it gives up early.
+    """
+    failure = failed_urls.get(url)
+    if failure is not None:
+        return [f"Error fetching {url}: {failure}"]
+
+    key = f"p:{max_paragraphs}:{url}"
+    cached = await _cache_get(pages_cache, key)
+    if cached is not None:
+        return cached
+
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        res = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(res.text, "html.parser")
-        paragraphs = [p.get_text(strip=True) for p in soup.find_all("p") if p.get_text(strip=True)]
-        return paragraphs[:max_paragraphs]
+        async with _host_limit(url):
+            paragraphs = await _stream_paragraphs(url, max_paragraphs, sink if sink is not None else [])
     except Exception as e:
+        failed_urls.set(url, str(e) or type(e).__name__)
         return [f"Error fetching {url}: {e}"]
 
-def get_top_paragraphs(query):
-    results = duckduckgo_search(query)
-    all_paragraphs = []
+    await _cache_set(pages_cache, key, paragraphs, PAGES_TTL)
+    return paragraphs
+
+async def get_top_paragraphs(query, deadline: float = SEARCH_DEADLINE):
+    """
+    Searches and fetches the result pages concurrently. Pages still loading when
+    the deadline passes are cancelled, keeping the paragraphs they had parsed so far.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    try:
+        results = await asyncio.wait_for(duckduckgo_search(query), timeout=deadline)
+    except Exception as e:
+        print(f"[search] Search failed for {query!r}: {e}")
+        return []
 
-    for r in results:
-        print(f"\nFetching from: {r['title']} ({r['url']})")
-        paras = fetch_page_paragraphs(r['url'])
-        all_paragraphs.extend(paras)
+    partial = [[] for _ in results]
+    tasks = [
+        asyncio.create_task(fetch_page_paragraphs(r["url"], sink=sink))
+        for r, sink in zip(results, partial)
+    ]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, timeout=max(0, end - loop.time()))
+    for task in pending:
+        task.cancel()
+
+    all_paragraphs = []
+    for r, task, sink in zip(results, tasks, partial):
+        if task in done:
+            print(f"\nFetched from: {r['title']} ({r['url']})")
+            all_paragraphs.extend(task.result())
+        else:
+            print(f"\nDeadline passed before: {r['title']} ({r['url']}), kept {len(sink)} paragraphs")
+            all_paragraphs.extend(sink)
 
     return all_paragraphs
 
-if __name__ == "__main__":
+async def _main():
     user_query = input("Enter search query: ")
-    paragraphs = get_top_paragraphs(user_query)
+    paragraphs = await get_top_paragraphs(user_query)
+    await close_client()
 
     print("\n--- Aggregated Paragraphs ---\n")
     for i, p in enumerate(paragraphs, 1):
-        print(f"{i}. {p}\n")
\ No newline at end of file
+        print(f"{i}. {p}\n")
+
+if __name__ == "__main__":
+    asyncio.run(_main())